@@ -0,0 +1,199 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module keeps an index of users who have tweeted about Kevin Bacon. The
+index is seeded with paginated bulk searches for the Kevin Bacon phrases, so
+any user found there is already one tweet away from the goal. An agent can
+stop as soon as such a user is mentioned, instead of waiting to fetch their
+timeline. The index is saved to a file and refreshed with only the tweets
+newer than the last refresh.
+"""
+
+import os
+import sys
+import json
+from records import Edge
+from bacon_pattern import BACON_PATTERN
+
+
+TWEET_TEXT = 'full_text'
+
+# one search for every form of the phrase, the standard search matches words
+# so each form is quoted or spelled out
+SEED_QUERY = '"kevin bacon" OR kevin_bacon OR kevinbacon'
+
+# largest number of pages fetched by one refresh
+MAX_SEED_PAGES = 10
+
+# file the index is saved to, relative to where the agent is run
+INDEX_PATH = os.environ.get('KB_INDEX', 'bacon_index.json')
+
+
+class BaconIndex(object):
+    """
+    Users known to have tweeted a form of "Kevin Bacon", each with one such
+    tweet.
+
+    Attribute(s):
+        path (str): file the index is loaded from and saved to, or None
+        goals (dict): screen name -> (tweet id, tweet text) of a Kevin Bacon
+                      tweet by that user
+        newest (int): id of the newest tweet every older tweet has been
+                      searched up to, or None
+        cursor (int): max_id an unfinished refresh carries on from, or None
+        cursor_newest (int): id of the newest tweet seen by the unfinished
+                             refresh, or None
+    """
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.goals = {}
+        self.newest = None
+        self.cursor = None
+        self.cursor_newest = None
+        if path and os.path.exists(path):
+            with open(path) as index_file:
+                index = json.load(index_file)
+            self.goals = dict((user, tuple(goal))
+                              for user, goal in index['goals'].items())
+            self.newest = index['newest']
+            self.cursor = index.get('cursor')
+            self.cursor_newest = index.get('cursor_newest')
+
+
+    def __len__(self):
+        return len(self.goals)
+
+
+    def __contains__(self, user):
+        return user in self.goals
+
+
+    def tweet(self, user):
+        """
+        Looks up the Kevin Bacon tweet of a user in the index.
+
+        Args:
+            user: screen name of the user
+
+        Returns:
+            An Edge of the user, tweet id and tweet text
+        """
+        tweet_id, tweet_text = self.goals[user]
+        return Edge(user, tweet_id, tweet_text)
+
+
+    def first_goal(self, mentions):
+        """
+        Finds the first mention of a user in the index.
+
+        Args:
+            mentions: list of tuples starting with (mentioned user, tweet)
+
+        Returns:
+            The first mention of a user in the index, or None
+        """
+        for mention in mentions:
+            if mention[0] in self.goals:
+                return mention
+        return None
+
+
+    def add_statuses(self, statuses):
+        """
+        Adds the authors of the tweets containing a form of "Kevin Bacon".
+        Search matches are checked against the pattern, as the search also
+        matches the phrase in names and links.
+
+        Args:
+            statuses: list of tweets returned by a search call
+
+        Returns:
+            The number of users added
+        """
+        added = 0
+        for tweet in statuses:
+            author = tweet.get('user')
+            if not author or author['screen_name'] in self.goals:
+                continue
+            if BACON_PATTERN.search(tweet[TWEET_TEXT]):
+                self.goals[author['screen_name']] = \
+                    (tweet['id'], tweet[TWEET_TEXT])
+                added += 1
+        return added
+
+
+    def refresh(self, twitter, max_pages=MAX_SEED_PAGES):
+        """
+        Pages backwards through the search results for the Kevin Bacon
+        phrases until an empty page, stopping at the newest tweet of the last
+        finished refresh, and saves the index. A refresh that runs out of pages or fails keeps
+        its place, and the next refresh carries on from there, so no tweets
+        between the two are skipped.
+
+        Args:
+            twitter: connection to search Twitter with
+            max_pages: largest number of pages to fetch
+
+        Returns:
+            The number of users added
+        """
+        added = 0
+        finished = False
+        for _ in range(max_pages):
+            results = twitter.search_twitter(SEED_QUERY, since_id=self.newest,
+                                             max_id=self.cursor)
+            try:
+                statuses = results['statuses']
+            except (TypeError, KeyError):
+                break
+            # a search page can be short before the end, only an empty one
+            # is the last
+            if not statuses:
+                finished = True
+                break
+            added += self.add_statuses(statuses)
+            ids = [tweet['id'] for tweet in statuses]
+            self.cursor_newest = max([self.cursor_newest or 0] + ids)
+            self.cursor = min(ids) - 1
+
+        # only a refresh that reached the last one may move past it
+        if finished:
+            if self.cursor_newest is not None:
+                self.newest = self.cursor_newest
+            self.cursor = None
+            self.cursor_newest = None
+        self.save()
+        return added
+
+
+    def save(self):
+        """ saves the index to its file """
+        if not self.path:
+            return
+        with open(self.path, 'w') as index_file:
+            json.dump({'newest': self.newest, 'cursor': self.cursor,
+                       'cursor_newest': self.cursor_newest,
+                       'goals': self.goals}, index_file)
+
+
+def main():
+    """ main function to build or refresh the index """
+    if len(sys.argv) > 2:
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 bacon_index.py [max_pages]")
+
+    # imported here, as search_trace.py imports this module and is imported
+    # by threaded_twitter_wrapper.py
+    from threaded_twitter_wrapper import TwitterConnection
+
+    max_pages = int(sys.argv[1]) if len(sys.argv) == 2 else MAX_SEED_PAGES
+    twitter = TwitterConnection()
+    twitter.connect_to_twitter()
+
+    index = BaconIndex()
+    added = index.refresh(twitter, max_pages)
+    print("%d users added, %d users in %s" % (added, len(index), index.path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module finds the tweets containing a form of "Kevin Bacon". It is shared
+by the agents, the index and the mention graph, and imports nothing but the
+standard library, so any of them can use it without a Twitter connection.
+"""
+
+import re
+
+
+TWEET_TEXT = 'full_text'
+
+# matches Kevin Bacon, Kevin_Bacon, or KevinBacon (case insensitive)
+BACON_PATTERN = re.compile(r'kevin[ _]?bacon', re.IGNORECASE | re.UNICODE)
+
+# joins page texts for the match pass, never part of a tweet
+PAGE_SEPARATOR = '\0'
+
+
+def find_bacon_tweet(statuses):
+    """
+    Runs a single match pass over the text of every tweet on a page, so a page
+    containing Kevin Bacon is detected before any of its mentions are added to
+    the frontier.
+
+    Args:
+        statuses: list of tweets returned by a search call
+
+    Return:
+        The first tweet on the page containing a form of "Kevin Bacon", or
+        None if no tweet matches
+
+    """
+    texts = [tweet[TWEET_TEXT] for tweet in statuses]
+    match = BACON_PATTERN.search(PAGE_SEPARATOR.join(texts))
+    if not match:
+        return None
+
+    # map the match offset back to the tweet it was found in
+    offset = match.start()
+    for tweet, text in zip(statuses, texts):
+        offset -= len(text) + len(PAGE_SEPARATOR)
+        if offset < 0:
+            return tweet
+    return None
@@ -0,0 +1,97 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module measures how long the agents take to expand a user, excluding the
+time spent waiting on Twitter. A recorded trace, see search_trace.py, is
+replayed as fast as possible against each agent several times, and the best
+run is divided by the number of users the agent fetched.
+
+Every run starts from an empty index of users who tweeted Kevin Bacon and
+the same seed for the mention sampling, so every run of an agent expands the
+same users. The module runs under Python 2.7 as well, to compare against
+trees from before the Python 3 port. A trace to benchmark with can be made
+with synthetic_trace.py.
+"""
+
+import sys
+import time
+import importlib
+import fanout
+from bacon_index import BaconIndex
+from search_trace import ReplayConnection
+
+
+# runs of each agent, the fastest one is reported
+REPEATS = 5
+
+# seed of the mention sampling in every run
+SEED = 0
+
+# perf_counter is only available from Python 3.3
+TIMER = getattr(time, 'perf_counter', time.time)
+
+
+def expansion_cost(trace_path, agent_name, user, repeats=REPEATS):
+    """
+    Replays a trace against an agent and times its searches.
+
+    Args:
+        trace_path: the trace file to replay
+        agent_name: module name of the agent, such as kb_bfs
+        user: a twitter user to start searching for Kevin Bacon from
+        repeats: number of runs
+
+    Returns:
+        The users fetched by a run, the searches missing from the trace, the
+        length of the path found and the seconds of the fastest run
+    """
+    agent = importlib.import_module(agent_name)
+    if not hasattr(agent, 'TWITTER') or \
+            not hasattr(agent, 'search_for_kevin_bacon'):
+        raise ValueError("agent %s does not search for Kevin Bacon through "
+                         "its own TWITTER, so it cannot replay a trace"
+                         % agent_name)
+
+    best = None
+    for _ in range(repeats):
+        connection = ReplayConnection(trace_path)
+        agent.TWITTER = connection
+        if hasattr(agent, 'BACON_INDEX'):
+            agent.BACON_INDEX = BaconIndex(None)
+        fanout.RANDOM.seed(SEED)
+
+        started = TIMER()
+        try:
+            path_to_kevin_bacon = list(agent.search_for_kevin_bacon(user))
+        except SystemExit:
+            path_to_kevin_bacon = []
+        seconds = TIMER() - started
+
+        if best is None or seconds < best:
+            best = seconds
+    return connection.calls, connection.missing, len(path_to_kevin_bacon), best
+
+
+def main():
+    """ main function to benchmark agents against a trace """
+    if len(sys.argv) < 4:
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 bench_expansion.py <trace> " + \
+                 "<twitter_user> <agent_module> [agent_module ...]")
+
+    trace_path, user = sys.argv[1:3]
+    print("%-16s %8s %8s %6s %10s %12s" %
+          ('agent', 'nodes', 'missing', 'path', 'seconds', 'us per node'))
+    for agent_name in sys.argv[3:]:
+        try:
+            nodes, missing, length, seconds = \
+                expansion_cost(trace_path, agent_name, user)
+        except ValueError as error:
+            sys.exit("Invalid Agent Exception\n%s" % error)
+        print("%-16s %8d %8d %6d %10.4f %12.1f" %
+              (agent_name, nodes, missing, length, seconds,
+               seconds / max(nodes, 1) * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module limits how many of the users mentioned on a single page are added
+to the hot frontier of a search. Popular accounts mention thousands of users,
+so only a sample of each page's new mentions is expanded right away. The
+sample is weighted by the engagement of the mentioning tweet and by verified
+status, and the rest is deferred to a cold frontier that is only searched once
+the hot frontier runs out.
+"""
+
+import random
+
+
+HOT = 'hot'
+COLD = 'cold'
+
+# largest number of new mentions from one page added to the hot frontier,
+# None to add every mention
+MAX_FANOUT = 20
+
+# weight multiplier for the verified author of a retweet
+VERIFIED_BOOST = 10.0
+
+# source of randomness for the weighted sample, seed it to replay a search
+RANDOM = random.Random()
+
+
+def mention_weight(user, tweet):
+    """
+    Weighs a mention by the engagement of the tweet it was made in, boosted if
+    the mentioned user is the verified author of a retweet.
+
+    Args:
+        user: screen name of the mentioned user
+        tweet: the tweet the user was mentioned in
+
+    Returns:
+        The weight of the mention
+    """
+    weight = 1.0 + tweet.get('retweet_count', 0) + \
+        tweet.get('favorite_count', 0)
+    try:
+        retweeted_user = tweet['retweeted_status']['user']
+        if retweeted_user['screen_name'] == user and \
+                retweeted_user['verified']:
+            weight *= VERIFIED_BOOST
+    except (TypeError, KeyError):
+        pass
+    return weight
+
+
+def split_mentions(mentions, limit=MAX_FANOUT):
+    """
+    Splits the new mentions of a page into the ones expanded now and the ones
+    deferred. If there are more than the limit, a weighted sample without
+    replacement is kept hot, using a random key of u ** (1 / weight) for each
+    mention.
+
+    Args:
+        mentions: list of tuples starting with (mentioned user, tweet)
+        limit: largest number of hot mentions, None for no limit
+
+    Returns:
+        The hot and the cold mentions, each in their original order
+    """
+    if limit is None or len(mentions) <= limit:
+        return mentions, []
+
+    keys = [RANDOM.random() ** (1.0 / mention_weight(mention[0], mention[1]))
+            for mention in mentions]
+    ranked = sorted(range(len(mentions)), key=lambda i: keys[i], reverse=True)
+    hot = set(ranked[:limit])
+    return [mention for i, mention in enumerate(mentions) if i in hot], \
+           [mention for i, mention in enumerate(mentions) if i not in hot]
@@ -13,11 +13,18 @@ import sys
 import time
 from collections import deque
 from threaded_twitter_wrapper import TwitterConnection
+from fanout import HOT, COLD, split_mentions
+from bacon_index import BaconIndex
+from records import Edge, FrontierEntry
+from bacon_pattern import find_bacon_tweet
 
 
 # open connection to Twitter API
 TWITTER = TwitterConnection()
 
+# users known to have tweeted Kevin Bacon
+BACON_INDEX = BaconIndex()
+
 KEVIN_BACON = 'Kevin Bacon'
 TWEET_TEXT = 'full_text'
 
@@ -28,28 +35,6 @@ TWEET_TEXT = 'full_text'
 SHAFTER_LIMIT = 15
 
 
-def __contains_kevin_bacon__(tweet):
-    """
-    Check if a tweet contains Kevin Bacon, Kevin_Bacon, or KevinBacon (case
-    insensitive).
-
-    Args:
-        tweet: tweet text
-
-    Return:
-        True if the tweet text contains a form of "Kevin Bacon"
-
-    """
-    tweet_text = tweet.lower()
-    if "kevin bacon" in tweet_text:
-        return True
-    if "kevin_bacon" in tweet_text:
-        return True
-    if "kevinbacon" in tweet_text:
-        return True
-    return False
-
-
 def __generate_path__(seen, user):
     """
     Generates the path to a user.
@@ -73,15 +58,45 @@ def __generate_path__(seen, user):
     return reversed(path_to_bacon)
 
 
+def __collect_mentions__(statuses, seen):
+    """
+    Extracts the mentions from every tweet on a page and checks them against
+    the seen users in bulk.
+
+    Args:
+        statuses: list of tweets returned by a search call
+        seen: a dictionary containing what twitter users have been seen and
+              their predecessor
+
+    Return:
+        A list of (mentioned user, tweet) pairs for users that have not been
+        seen, in the order they were first mentioned on the page
+
+    """
+    mentions = [(mention['screen_name'], tweet)
+                for tweet in statuses
+                for mention in tweet['entities']['user_mentions']]
+    unseen = set(user for user, _ in mentions).difference(seen)
+
+    new_mentions = []
+    for mentioned_user, tweet in mentions:
+        if mentioned_user in unseen:
+            unseen.discard(mentioned_user)
+            new_mentions.append((mentioned_user, tweet))
+    return new_mentions
+
+
 def __search_stack__(search_stack, seen, depth_limit):
     """
-    Searches a given stack and checks to see if Kevin Bacon exists. If Kevin
-    Bacon is found, return True and the path to get to him, otherwise add any
-    mentioned users to the stack. Repeat until Kevin Bacon is found or the
-    stack is empty.
+    Searches a given dictionary of stacks and checks to see if Kevin Bacon
+    exists. If Kevin Bacon is found, return True and the path to get to him,
+    otherwise add a sample of the mentioned users to the hot stack and defer
+    the rest to the cold stack, which is only searched once the hot stack is
+    empty. Repeat until Kevin Bacon is found or the stacks are empty.
 
     Args:
-        search_stack: a stack containing the users to search through
+        search_stack: a dictionary containing a hot and cold stack containing
+                      the users to search through
         seen: a dictionary containing what twitter users have been seen and
               their predecessor
         depth_limit: a limit for how deep from the root to search
@@ -91,17 +106,21 @@ def __search_stack__(search_stack, seen, depth_limit):
 
     """
 
-    # stack for tweets that exceed depth
-    exceeds_depth_stack = deque()
+    # stacks for tweets that exceed depth
+    exceeds_depth_stack = {
+        HOT: deque(),
+        COLD: deque(),
+    }
 
-    while search_stack:
-        # get current user to search
-        current_user, current_depth = search_stack.pop()
+    while search_stack[HOT] or search_stack[COLD]:
+        # get current user to search, deferred users only once hot is empty
+        temperature = HOT if search_stack[HOT] else COLD
+        current_user, current_depth = search_stack[temperature].pop()
 
         # check if depth is greater than the provided depth limit
         if current_depth > depth_limit:
-            current = (current_user, current_depth)
-            exceeds_depth_stack.append(current)
+            current = FrontierEntry(current_user, current_depth)
+            exceeds_depth_stack[temperature].append(current)
             continue
 
         # queries twitter
@@ -110,26 +129,40 @@ def __search_stack__(search_stack, seen, depth_limit):
 
         # search through current users tweets
         try:
-            for tweet in tweets['statuses']:
-                if __contains_kevin_bacon__(tweet[TWEET_TEXT]):
-                    # mark Kevin Bacon as seen and generate path to him
-                    seen[KEVIN_BACON] =\
-                            (current_user, tweet['id'], tweet[TWEET_TEXT])
-                    path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
-                    return True, path_to_kevin_bacon, search_stack, seen
-
-                # search for mentions to add to stack
-                for mention in tweet['entities']['user_mentions']:
-                    mentioned_user = mention['screen_name']
-                    if mentioned_user in seen:
-                        continue
-
+            statuses = tweets['statuses']
+
+            # check the whole page for Kevin Bacon before expanding it
+            bacon_tweet = find_bacon_tweet(statuses)
+            if bacon_tweet:
+                # mark Kevin Bacon as seen and generate path to him
+                seen[KEVIN_BACON] = Edge(current_user, bacon_tweet['id'],
+                                         bacon_tweet[TWEET_TEXT])
+                path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
+                return True, path_to_kevin_bacon, search_stack, seen
+
+            new_mentions = __collect_mentions__(statuses, seen)
+
+            # stop at the first mention of a user known to tweet Kevin Bacon
+            goal = BACON_INDEX.first_goal(new_mentions)
+            if goal:
+                goal_user, tweet = goal[0], goal[1]
+                seen[goal_user] = \
+                        Edge(current_user, tweet['id'], tweet[TWEET_TEXT])
+                seen[KEVIN_BACON] = BACON_INDEX.tweet(goal_user)
+                path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
+                return True, path_to_kevin_bacon, search_stack, seen
+
+            # add a sample of unseen mentions to the hot stack, rest to cold
+            hot, cold = split_mentions(new_mentions)
+            for temperature, mentions in ((HOT, hot), (COLD, cold)):
+                for mentioned_user, tweet in mentions:
                     # generate path to mentioned user and add to seen
                     path_to_mention =\
-                            (current_user, tweet['id'], tweet[TWEET_TEXT])
+                            Edge(current_user, tweet['id'], tweet[TWEET_TEXT])
                     seen[mentioned_user] = path_to_mention
 
-                    search_stack.append((mentioned_user, current_depth + 1))
+                    search_stack[temperature].append(
+                        FrontierEntry(mentioned_user, current_depth + 1))
         except TypeError:
             pass
 
@@ -138,9 +171,9 @@ def __search_stack__(search_stack, seen, depth_limit):
 
 def search_for_kevin_bacon(start):
     """
-    Creates a stack starting with a given user and executes a search with a
-    specified depth. If Kevin Bacon is found return the search results, else
-    continue on with a new depth.
+    Creates a dictionary of stacks starting with a given user and executes a
+    search with a specified depth. If Kevin Bacon is found return the search
+    results, else continue on with a new depth.
 
     Args:
         start: a twitter user to start searching for Kevin Bacon from
@@ -149,9 +182,16 @@ def search_for_kevin_bacon(start):
         The path to get to Kevin Bacon unless none is found
 
     """
-    search_stack = deque()
-    search_stack.append((start, 0))
+    search_stack = {
+        HOT: deque(),
+        COLD: deque()
+    }
+    search_stack[HOT].append(FrontierEntry(start, 0))
     seen = {start: None}
+
+    # the start user may be known to have tweeted Kevin Bacon
+    if start in BACON_INDEX:
+        return [BACON_INDEX.tweet(start)]
     depth_limit = 3
 
     while depth_limit <= SHAFTER_LIMIT:
@@ -163,7 +203,7 @@ def search_for_kevin_bacon(start):
         # if Kevin Bacon is not found increase depth
         depth_limit += 2
 
-    print 'No connection to Kevin Bacon'
+    print('No connection to Kevin Bacon')
     sys.exit(0)
 
 
@@ -171,19 +211,22 @@ def main():
     """ main function to execute to run agent """
     if len(sys.argv) != 2:
         sys.exit("Invalid Argument Exception\n" + \
-                 "Usage: python2 kb.py <twitter_user>")
+                 "Usage: python3 kb.py <twitter_user>")
 
     start = time.time()
 
     # connection to Twitter API
     TWITTER.connect_to_twitter()
 
+    # seed the users known to have tweeted Kevin Bacon
+    BACON_INDEX.refresh(TWITTER)
+
     # prints resutls of search
     for tweet in search_for_kevin_bacon(sys.argv[1]):
         user, tweet_id, tweet_text = tweet
-        print "%s, %d, %s" % (user, tweet_id, tweet_text)
+        print("%s, %d, %s" % (user, tweet_id, tweet_text))
 
-    print "--- %s seconds ---" % (time.time() - start)
+    print("--- %s seconds ---" % (time.time() - start))
 
 if __name__ == '__main__':
     main()
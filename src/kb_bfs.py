@@ -11,13 +11,20 @@ from the Twython API.
 
 import sys
 import time
-from collections import deque
+from collections import deque, Counter
 from threaded_twitter_wrapper import TwitterConnection
+from fanout import HOT, COLD, split_mentions
+from bacon_index import BaconIndex
+from records import Edge, FrontierEntry
+from bacon_pattern import find_bacon_tweet
 
 
 # open connection to Twitter API
 TWITTER = TwitterConnection()
 
+# users known to have tweeted Kevin Bacon
+BACON_INDEX = BaconIndex()
+
 KEVIN_BACON = 'Kevin Bacon'
 TWEET_TEXT = 'full_text'
 
@@ -28,28 +35,6 @@ TWEET_TEXT = 'full_text'
 SHAFTER_LIMIT = 15
 
 
-def __contains_kevin_bacon__(tweet):
-    """
-    Check if a tweet contains Kevin Bacon, Kevin_Bacon, or KevinBacon (case
-    insensitive).
-
-    Args:
-        tweet: tweet text
-
-    Return:
-        True if the tweet text contains a form of "Kevin Bacon"
-
-    """
-    tweet_text = tweet.lower()
-    if "kevin bacon" in tweet_text:
-        return True
-    if "kevin_bacon" in tweet_text:
-        return True
-    if "kevinbacon" in tweet_text:
-        return True
-    return False
-
-
 def __generate_path__(seen, user):
     """
     Generates the path to a user.
@@ -74,15 +59,48 @@ def __generate_path__(seen, user):
     return path_to_bacon
 
 
+def __collect_mentions__(statuses, seen):
+    """
+    Extracts the mentions from every tweet on a page and checks them against
+    the seen users in bulk.
+
+    Args:
+        statuses: list of tweets returned by a search call
+        seen: a dictionary containing what twitter users have been seen and
+              their predecessor
+
+    Return:
+        A list of (mentioned user, tweet) pairs for users that have not been
+        seen, in the order they were first mentioned on the page
+
+    """
+    mentions = [(mention['screen_name'], tweet)
+                for tweet in statuses
+                for mention in tweet['entities']['user_mentions']]
+    unseen = set(user for user, _ in mentions).difference(seen)
+
+    new_mentions = []
+    for mentioned_user, tweet in mentions:
+        if mentioned_user in unseen:
+            unseen.discard(mentioned_user)
+            new_mentions.append((mentioned_user, tweet))
+    return new_mentions
+
+
 def __search_queue__(search_queue, seen):
     """
-    Searches a given queue and checks to see if Kevin Bacon exists. If Kevin
-    Bacon is found, return True and the path to get to him, otherwise add any
-    mentioned users to the queue. Repeat until Kevin Bacon is found or the
-    queue is empty.
+    Searches a given dictionary of queues and checks to see if Kevin Bacon
+    exists. If Kevin Bacon is found, return True and the path to get to him,
+    otherwise add a sample of the mentioned users to the hot queue and defer
+    the rest to the cold queue, which is only searched once the hot queue is
+    empty. Repeat until Kevin Bacon is found or the queues are empty. A
+    mention of a user known to tweet Kevin Bacon ends the search once no user
+    above its depth is left to search, skipping the users that could not lead
+    to a shorter path.
 
     Args:
-        search_queue: a queue containing the users to search through
+        search_queue: a dictionary containing a hot and cold queue containing
+                      the users to search through
         seen: a dictionary containing what twitter users have been seen and
               their predecessor
 
@@ -91,9 +109,30 @@ def __search_queue__(search_queue, seen):
 
     """
 
-    while search_queue:
-        # get the current user to search
-        current_user = search_queue.popleft()
+    # users still queued at each depth
+    queued = Counter(entry.depth for queue in search_queue.values()
+                     for entry in queue)
+
+    # path through the first mention of a user known to tweet Kevin Bacon,
+    # only taken once every user it could be longer than has been searched
+    goal_path = None
+
+    while search_queue[HOT] or search_queue[COLD]:
+        if goal_path and not any(queued[depth]
+                                 for depth in range(len(goal_path) - 1)):
+            break
+
+        # get the current user to search, deferred users only once hot is empty
+        if search_queue[HOT]:
+            current_user, current_depth = search_queue[HOT].popleft()
+            queued[current_depth] -= 1
+        else:
+            current_user, current_depth = search_queue[COLD].popleft()
+            queued[current_depth] -= 1
+
+        # a user this deep cannot lead to a path shorter than the goal
+        if goal_path and current_depth >= len(goal_path) - 1:
+            continue
 
         # queries twitter
         query = "from:%s" % current_user
@@ -101,36 +140,54 @@ def __search_queue__(search_queue, seen):
 
         # search through current users tweets
         try:
-            for tweet in tweets['statuses']:
-                if __contains_kevin_bacon__(tweet[TWEET_TEXT]):
-                    # mark Kevin Bacon as seen and generate path to him
-                    seen[KEVIN_BACON] =\
-                            (current_user, tweet['id'], tweet[TWEET_TEXT])
-                    path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
-                    return True, path_to_kevin_bacon, search_queue, seen
-
-                # search for mentions to add to queue
-                for mention in tweet['entities']['user_mentions']:
-                    mentioned_user = mention['screen_name']
-                    if mentioned_user in seen:
-                        continue
-
+            statuses = tweets['statuses']
+
+            # check the whole page for Kevin Bacon before expanding it
+            bacon_tweet = find_bacon_tweet(statuses)
+            if bacon_tweet:
+                # mark Kevin Bacon as seen and generate path to him
+                seen[KEVIN_BACON] = Edge(current_user, bacon_tweet['id'],
+                                         bacon_tweet[TWEET_TEXT])
+                path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
+                if goal_path and len(goal_path) < len(path_to_kevin_bacon):
+                    path_to_kevin_bacon = goal_path
+                return True, path_to_kevin_bacon, search_queue, seen
+
+            new_mentions = __collect_mentions__(statuses, seen)
+
+            # remember the first mention of a user known to tweet Kevin Bacon
+            goal = None if goal_path else BACON_INDEX.first_goal(new_mentions)
+            if goal:
+                goal_user, tweet = goal[0], goal[1]
+                goal_path = list(__generate_path__(seen, current_user))
+                goal_path.append(
+                    Edge(current_user, tweet['id'], tweet[TWEET_TEXT]))
+                goal_path.append(BACON_INDEX.tweet(goal_user))
+
+            # add a sample of unseen mentions to the hot queue, rest to cold
+            hot, cold = split_mentions(new_mentions)
+            for temperature, mentions in ((HOT, hot), (COLD, cold)):
+                for mentioned_user, tweet in mentions:
                     # generate path to mentioned user and add to seen
                     path_to_mention =\
-                            (current_user, tweet['id'], tweet[TWEET_TEXT])
+                            Edge(current_user, tweet['id'], tweet[TWEET_TEXT])
                     seen[mentioned_user] = path_to_mention
 
-                    search_queue.append(mentioned_user)
+                    search_queue[temperature].append(
+                        FrontierEntry(mentioned_user, current_depth + 1))
+                    queued[current_depth + 1] += 1
         except TypeError:
             pass
 
+    if goal_path:
+        return True, goal_path, search_queue, seen
     return False, [], search_queue, seen
 
 
 def search_for_kevin_bacon(start):
     """
-    Creates a queue starting with a given user and executes a search.
-    If Kevin Bacon is found return the search results.
+    Creates a dictionary of queues starting with a given user and executes a
+    search. If Kevin Bacon is found return the search results.
 
     Args:
         start: a twitter user to start searching for Kevin Bacon from
@@ -139,16 +196,23 @@ def search_for_kevin_bacon(start):
         The path to get to Kevin Bacon unless none is found
 
     """
-    search_queue = deque()
-    search_queue.append(start)
+    search_queue = {
+        HOT: deque(),
+        COLD: deque()
+    }
+    search_queue[HOT].append(FrontierEntry(start, 0))
     seen = {start: None}
 
+    # the start user may be known to have tweeted Kevin Bacon
+    if start in BACON_INDEX:
+        return [BACON_INDEX.tweet(start)]
+
     found, search_results, search_queue, seen = \
         __search_queue__(search_queue, seen)
     if found:
         return search_results
 
-    print 'No connection to Kevin Bacon'
+    print('No connection to Kevin Bacon')
     sys.exit(0)
 
 
@@ -156,19 +220,22 @@ def main():
     """ main function to execute to run agent """
     if len(sys.argv) != 2:
         sys.exit("Invalid Argument Exception\n" + \
-                 "Usage: python2 kb.py <twitter_user>")
+                 "Usage: python3 kb.py <twitter_user>")
 
     start = time.time()
 
     # connection to Twitter API
     TWITTER.connect_to_twitter()
 
+    # seed the users known to have tweeted Kevin Bacon
+    BACON_INDEX.refresh(TWITTER)
+
     # prints resutls of search
     for tweet in search_for_kevin_bacon(sys.argv[1]):
         user, tweet_id, tweet_text = tweet
-        print "%s, %d, %s" % (user, tweet_id, tweet_text)
+        print("%s, %d, %s" % (user, tweet_id, tweet_text))
 
-    print "--- %s seconds ---" % (time.time() - start)
+    print("--- %s seconds ---" % (time.time() - start))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,508 @@
+"""
+Six Degrees of Kevin Bacon
+Author: Chris Lim
+Date: 2/28/18
+
+This intelligent agent determines how far a given individual is from following
+Kevin Bacon on Twitter. The agent is limited to using the search() function
+from the Twython API.
+
+Unlike kb_bfs.py, the breadth-first search is level-synchronous: a whole
+frontier level is fetched at once and the mentions it produced are turned into
+integer edge arrays, so the next level is built with NumPy set operations
+instead of a dictionary lookup per mention. It can also record every
+shortest-path predecessor and list several shortest paths from one search.
+"""
+
+
+import sys
+import time
+from itertools import islice
+import numpy as np
+from threaded_twitter_wrapper import TwitterConnection
+from tweet_store import TextStore
+from bacon_index import BaconIndex
+from records import Edge
+from bacon_pattern import BACON_PATTERN, find_bacon_tweet
+
+
+# open connection to Twitter API
+TWITTER = TwitterConnection()
+
+# users known to have tweeted Kevin Bacon
+BACON_INDEX = BaconIndex()
+
+KEVIN_BACON = 'Kevin Bacon'
+TWEET_TEXT = 'full_text'
+
+# marks a user that was not discovered through a mention (the start user)
+NO_PREDECESSOR = -1
+
+# initial number of users the interned arrays can hold before growing
+INITIAL_CAPACITY = 1024
+
+
+def __fetch_timeline__(user):
+    """
+    Queries Twitter for the recent tweets of a user.
+
+    Args:
+        user: twitter user to fetch the tweets of
+
+    Return:
+        The results of the search call made to Twitter
+
+    """
+    return TWITTER.search_twitter("from:%s" % user)
+
+
+class SearchGraph(object):
+    """
+    Interned state of a level-synchronous search. Screen names are mapped to
+    integer ids so that visited checks and predecessor updates for a whole
+    level are array operations.
+
+    Attribute(s):
+        names (list): screen name of each user id
+        ids (dict): user id of each screen name
+        visited (ndarray): whether each user id has been added to a level
+        predecessor (ndarray): user id that first mentioned each user
+        via_tweet (ndarray): index of the tweet each user was first
+                             mentioned in
+        mentioned (ndarray): number of mentions of each user by the levels
+                             searched so far
+        tweet_ids (list): id of each stored tweet
+        tweet_texts (TextStore): compressed text of each stored tweet
+    """
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.names = []
+        self.ids = {}
+        self.visited = np.zeros(capacity, dtype=bool)
+        self.predecessor = np.full(capacity, NO_PREDECESSOR, dtype=np.int64)
+        self.via_tweet = np.full(capacity, NO_PREDECESSOR, dtype=np.int64)
+        self.mentioned = np.zeros(capacity, dtype=np.int64)
+        self.tweet_ids = []
+        self.tweet_texts = TextStore()
+
+
+    def __grow__(self, size):
+        """
+        Grows the per-user arrays so they can hold at least size users.
+
+        Args:
+            size: number of users the arrays must hold
+        """
+        capacity = len(self.visited)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        extra = capacity - len(self.visited)
+        self.visited = np.concatenate(
+            (self.visited, np.zeros(extra, dtype=bool)))
+        self.predecessor = np.concatenate(
+            (self.predecessor, np.full(extra, NO_PREDECESSOR, dtype=np.int64)))
+        self.via_tweet = np.concatenate(
+            (self.via_tweet, np.full(extra, NO_PREDECESSOR, dtype=np.int64)))
+        self.mentioned = np.concatenate(
+            (self.mentioned, np.zeros(extra, dtype=np.int64)))
+
+
+    def intern(self, names):
+        """
+        Maps screen names to user ids, assigning new ids to unseen names.
+
+        Args:
+            names: list of screen names
+
+        Returns:
+            An integer array with the user id of each name
+        """
+        ids = self.ids
+        for name in names:
+            if name not in ids:
+                ids[name] = len(self.names)
+                self.names.append(name)
+        self.__grow__(len(self.names))
+        return np.fromiter((ids[name] for name in names), dtype=np.int64,
+                           count=len(names))
+
+
+    def add_tweets(self, tweet_ids, tweet_texts):
+        """
+        Stores tweets that are used as predecessor edges.
+
+        Args:
+            tweet_ids: list of tweet ids
+            tweet_texts: list of tweet texts
+
+        Returns:
+            The index of the first stored tweet
+        """
+        first = len(self.tweet_ids)
+        self.tweet_ids.extend(tweet_ids)
+        self.tweet_texts.extend(tweet_texts)
+        return first
+
+
+    def edge(self, user_id, tweet_index):
+        """
+        Returns the path entry for a tweet made by a user.
+
+        Args:
+            user_id: id of the user that made the tweet
+            tweet_index: index of the stored tweet
+
+        Returns:
+            An Edge of the user, tweet id and tweet text
+        """
+        return Edge(self.names[user_id], self.tweet_ids[tweet_index],
+                    self.tweet_texts.get(tweet_index))
+
+
+    def path(self, user_id):
+        """
+        Generates the path to a user by following the predecessor arrays.
+
+        Args:
+            user_id: id of the user to generate the path to
+
+        Returns:
+            A list of the path from the start user to the given user
+        """
+        path_to_user = []
+        predecessor = self.predecessor[user_id]
+        while predecessor != NO_PREDECESSOR:
+            path_to_user.append(
+                self.edge(predecessor, self.via_tweet[user_id]))
+            user_id = predecessor
+            predecessor = self.predecessor[user_id]
+        path_to_user.reverse()
+        return path_to_user
+
+
+def __search_level__(frontier, graph, fetch):
+    """
+    Fetches the tweets of every user in a frontier level and checks to see if
+    Kevin Bacon exists. If Kevin Bacon is found, return True and the path to
+    get to him, otherwise build the next level from every unvisited user
+    mentioned by this level. A next level user known to have tweeted Kevin
+    Bacon ends the search without fetching that level.
+
+    Args:
+        frontier: an integer array of the user ids in the current level
+        graph: the SearchGraph of the search
+        fetch: function returning the search results for a user
+
+    Returns:
+        True if Kevin Bacon has been found, the path used to reach him, and
+        the user ids of the next level
+
+    """
+    edge_sources = []
+    edge_names = []
+    edge_tweets = []
+    level_tweet_ids = []
+    level_tweet_texts = []
+
+    for user_id in frontier:
+        current_user = graph.names[user_id]
+        tweets = fetch(current_user)
+
+        # search through current users tweets
+        try:
+            statuses = tweets['statuses']
+
+            # check the whole page for Kevin Bacon before expanding it
+            bacon_tweet = find_bacon_tweet(statuses)
+            if bacon_tweet:
+                path_to_kevin_bacon = graph.path(user_id)
+                path_to_kevin_bacon.append(
+                    Edge(current_user, bacon_tweet['id'],
+                         bacon_tweet[TWEET_TEXT]))
+                return True, path_to_kevin_bacon, None
+
+            # record every mention as an edge of this level
+            for tweet in statuses:
+                mentions = tweet['entities']['user_mentions']
+                if not mentions:
+                    continue
+                tweet_index = len(level_tweet_ids)
+                level_tweet_ids.append(tweet['id'])
+                level_tweet_texts.append(tweet[TWEET_TEXT])
+                for mention in mentions:
+                    edge_sources.append(user_id)
+                    edge_names.append(mention['screen_name'])
+                    edge_tweets.append(tweet_index)
+        except TypeError:
+            pass
+
+    if not edge_names:
+        return False, [], np.zeros(0, dtype=np.int64)
+
+    # count every mention, then drop edges to users already visited
+    targets = graph.intern(edge_names)
+    graph.mentioned += np.bincount(targets, minlength=len(graph.mentioned))
+    sources = np.array(edge_sources, dtype=np.int64)
+    tweet_indices = np.array(edge_tweets, dtype=np.int64)
+    unvisited = ~graph.visited[targets]
+    targets = targets[unvisited]
+    sources = sources[unvisited]
+    tweet_indices = tweet_indices[unvisited]
+
+    # keep the first mention of each new user, in the order it was made
+    _, first = np.unique(targets, return_index=True)
+    first.sort()
+    next_frontier = targets[first]
+
+    # store only the tweets that became predecessor edges
+    used_tweets, edge_slots = np.unique(tweet_indices[first],
+                                        return_inverse=True)
+    offset = graph.add_tweets([level_tweet_ids[i] for i in used_tweets],
+                              [level_tweet_texts[i] for i in used_tweets])
+
+    graph.visited[next_frontier] = True
+    graph.predecessor[next_frontier] = sources[first]
+    graph.via_tweet[next_frontier] = edge_slots + offset
+
+    # this level has no Kevin Bacon tweet, so a known one in the next level
+    # is on a shortest path
+    for user_id in next_frontier:
+        user = graph.names[user_id]
+        if user in BACON_INDEX:
+            path_to_kevin_bacon = graph.path(user_id)
+            path_to_kevin_bacon.append(BACON_INDEX.tweet(user))
+            return True, path_to_kevin_bacon, None
+
+    return False, [], next_frontier
+
+
+def find_kevin_bacon(start, fetch=None):
+    """
+    Runs a level-synchronous breadth-first search from a given user.
+
+    Args:
+        start: a twitter user to start searching for Kevin Bacon from
+        fetch: function returning the search results for a user, defaults to
+               querying Twitter
+
+    Returns:
+        The path to get to Kevin Bacon, or None if none is found
+
+    """
+    # the start user may be known to have tweeted Kevin Bacon
+    if start in BACON_INDEX:
+        return [BACON_INDEX.tweet(start)]
+
+    fetch = fetch or __fetch_timeline__
+    graph = SearchGraph()
+    frontier = graph.intern([start])
+    graph.visited[frontier] = True
+
+    while len(frontier):
+        found, search_results, frontier = \
+            __search_level__(frontier, graph, fetch)
+        if found:
+            return search_results
+    return None
+
+
+def __predecessor_index__(levels):
+    """
+    Indexes the predecessor edges recorded for every level by target user.
+
+    Args:
+        levels: list of (targets, sources, tweet indices) arrays, one for
+                each level
+
+    Returns:
+        The targets, sources and tweet indices of every edge, sorted by target
+
+    """
+    if not levels:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    targets, sources, tweet_indices = \
+        [np.concatenate(arrays) for arrays in zip(*levels)]
+    order = np.argsort(targets, kind='mergesort')
+    return targets[order], sources[order], tweet_indices[order]
+
+
+def __paths_to__(graph, index, user_id):
+    """
+    Lazily generates every shortest path to a user by following all of its
+    same-level predecessor edges.
+
+    Args:
+        graph: the SearchGraph of the search
+        index: predecessor edges sorted by target user
+        user_id: id of the user to generate the paths to
+
+    Returns:
+        A generator of the paths from the start user to the given user
+
+    """
+    targets, sources, tweet_indices = index
+    first = np.searchsorted(targets, user_id, side='left')
+    last = np.searchsorted(targets, user_id, side='right')
+    if first == last:
+        yield []
+        return
+    for source, tweet_index in zip(sources[first:last],
+                                   tweet_indices[first:last]):
+        for path in __paths_to__(graph, index, source):
+            yield path + [graph.edge(source, tweet_index)]
+
+
+def find_all_paths(start, fetch=None):
+    """
+    Runs a level-synchronous breadth-first search from a given user that
+    records every same-level predecessor edge instead of only the first, and
+    lazily generates every distinct shortest path to Kevin Bacon. The rest of
+    the level Kevin Bacon was found in is only fetched if more paths are
+    requested after the ones already found.
+
+    Args:
+        start: a twitter user to start searching for Kevin Bacon from
+        fetch: function returning the search results for a user, defaults to
+               querying Twitter
+
+    Returns:
+        A generator of the shortest paths to get to Kevin Bacon
+
+    """
+    fetch = fetch or __fetch_timeline__
+    graph = SearchGraph()
+    frontier = graph.intern([start])
+    graph.visited[frontier] = True
+    levels = []
+    index = None
+
+    while len(frontier):
+        edge_sources = []
+        edge_names = []
+        edge_tweets = []
+        level_tweet_ids = []
+        level_tweet_texts = []
+
+        for user_id in frontier:
+            current_user = graph.names[user_id]
+            tweets = fetch(current_user)
+
+            # search through current users tweets
+            try:
+                statuses = tweets['statuses']
+
+                # every Kevin Bacon tweet ends a distinct path
+                bacon_tweets = [tweet for tweet in statuses
+                                if BACON_PATTERN.search(tweet[TWEET_TEXT])]
+                if bacon_tweets:
+                    if index is None:
+                        index = __predecessor_index__(levels)
+                    for bacon_tweet in bacon_tweets:
+                        last = Edge(current_user, bacon_tweet['id'],
+                                    bacon_tweet[TWEET_TEXT])
+                        for path in __paths_to__(graph, index, user_id):
+                            yield path + [last]
+                    continue
+
+                # no next level is needed once Kevin Bacon has been found
+                if index is not None:
+                    continue
+
+                # record every mention as an edge of this level
+                for tweet in statuses:
+                    mentions = tweet['entities']['user_mentions']
+                    if not mentions:
+                        continue
+                    tweet_index = len(level_tweet_ids)
+                    level_tweet_ids.append(tweet['id'])
+                    level_tweet_texts.append(tweet[TWEET_TEXT])
+                    for mention in mentions:
+                        edge_sources.append(user_id)
+                        edge_names.append(mention['screen_name'])
+                        edge_tweets.append(tweet_index)
+            except TypeError:
+                pass
+
+        if index is not None or not edge_names:
+            return
+
+        # keep every edge to a user that has not been visited
+        targets = graph.intern(edge_names)
+        sources = np.array(edge_sources, dtype=np.int64)
+        tweet_indices = np.array(edge_tweets, dtype=np.int64)
+        unvisited = ~graph.visited[targets]
+        targets = targets[unvisited]
+        sources = sources[unvisited]
+        tweet_indices = tweet_indices[unvisited]
+
+        # the next level holds each new user once, in the order it was found
+        _, first = np.unique(targets, return_index=True)
+        first.sort()
+        frontier = targets[first]
+        graph.visited[frontier] = True
+
+        # store the tweets of the edges, dropping repeated mentions
+        edges = np.unique(np.stack((targets, sources, tweet_indices), axis=1),
+                          axis=0)
+        used_tweets, edge_slots = np.unique(edges[:, 2], return_inverse=True)
+        offset = graph.add_tweets([level_tweet_ids[i] for i in used_tweets],
+                                  [level_tweet_texts[i] for i in used_tweets])
+        levels.append((edges[:, 0], edges[:, 1], edge_slots + offset))
+
+
+def search_for_kevin_bacon(start, fetch=None):
+    """
+    Executes a level-synchronous search starting with a given user. If Kevin
+    Bacon is found return the search results.
+
+    Args:
+        start: a twitter user to start searching for Kevin Bacon from
+        fetch: function returning the search results for a user, defaults to
+               querying Twitter
+
+    Returns:
+        The path to get to Kevin Bacon unless none is found
+
+    """
+    search_results = find_kevin_bacon(start, fetch)
+    if search_results is not None:
+        return search_results
+
+    print('No connection to Kevin Bacon')
+    sys.exit(0)
+
+
+def main():
+    """ main function to execute to run agent """
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 kb_bfs_level.py <twitter_user> [paths]")
+
+    start = time.time()
+
+    # connection to Twitter API
+    TWITTER.connect_to_twitter()
+
+    # seed the users known to have tweeted Kevin Bacon
+    BACON_INDEX.refresh(TWITTER)
+
+    # prints resutls of search
+    if len(sys.argv) == 2:
+        for tweet in search_for_kevin_bacon(sys.argv[1]):
+            user, tweet_id, tweet_text = tweet
+            print("%s, %d, %s" % (user, tweet_id, tweet_text))
+    else:
+        paths = islice(find_all_paths(sys.argv[1]), int(sys.argv[2]))
+        for number, path_to_kevin_bacon in enumerate(paths):
+            if number:
+                print()
+            for tweet in path_to_kevin_bacon:
+                user, tweet_id, tweet_text = tweet
+                print("%s, %d, %s" % (user, tweet_id, tweet_text))
+
+    print("--- %s seconds ---" % (time.time() - start))
+
+if __name__ == '__main__':
+    main()
@@ -10,13 +10,20 @@ from the Twython API.
 
 
 import sys
-from collections import deque
+from collections import deque, Counter
 from threaded_twitter_wrapper import TwitterConnection
+from fanout import COLD, split_mentions
+from bacon_index import BaconIndex
+from records import Edge, FrontierEntry
+from bacon_pattern import find_bacon_tweet
 
 
 # open connection to Twitter API
 TWITTER = TwitterConnection()
 
+# users known to have tweeted Kevin Bacon
+BACON_INDEX = BaconIndex()
+
 KEVIN_BACON = 'Kevin Bacon'
 TWEET_TEXT = 'full_text'
 VERIFIED = 'verified'
@@ -29,28 +36,6 @@ UNVERIFIED = 'unverified'
 SHAFTER_LIMIT = 15
 
 
-def __contains_kevin_bacon__(tweet):
-    """
-    Check if a tweet contains Kevin Bacon, Kevin_Bacon, or KevinBacon (case
-    insensitive).
-
-    Args:
-        tweet: tweet text
-
-    Return:
-        True if the tweet text contains a form of "Kevin Bacon"
-
-    """
-    tweet_text = tweet.lower()
-    if "kevin bacon" in tweet_text:
-        return True
-    if "kevin_bacon" in tweet_text:
-        return True
-    if "kevinbacon" in tweet_text:
-        return True
-    return False
-
-
 def __generate_path__(seen, user):
     """
     Generates the path to a user.
@@ -74,13 +59,68 @@ def __generate_path__(seen, user):
     return reversed(path_to_bacon)
 
 
+def __verified_retweet__(tweet):
+    """
+    Finds the author of a retweet if that author is a verified user.
+
+    Args:
+        tweet: a tweet returned by a search call
+
+    Return:
+        The screen name of the verified retweeted user, or None
+
+    """
+    try:
+        if tweet['retweeted_status']['user']['verified']:
+            return tweet['retweeted_status']['user']['screen_name']
+    except (TypeError, KeyError):
+        pass
+    return None
+
+
+def __collect_mentions__(statuses, seen):
+    """
+    Extracts the verified retweeted users and the mentions from every tweet on
+    a page and checks them against the seen users in bulk.
+
+    Args:
+        statuses: list of tweets returned by a search call
+        seen: a dictionary containing what twitter users have been seen and
+              their predecessor
+
+    Return:
+        A list of (user, tweet, priority) triples for users that have not been
+        seen, in the order they were first found on the page
+
+    """
+    mentions = []
+    for tweet in statuses:
+        retweeted_user = __verified_retweet__(tweet)
+        if retweeted_user:
+            mentions.append((retweeted_user, tweet, VERIFIED))
+        for mention in tweet['entities']['user_mentions']:
+            mentions.append((mention['screen_name'], tweet, UNVERIFIED))
+    unseen = set(user for user, _, _ in mentions).difference(seen)
+
+    new_mentions = []
+    for mention in mentions:
+        if mention[0] in unseen:
+            unseen.discard(mention[0])
+            new_mentions.append(mention)
+    return new_mentions
+
+
 def __search_queue__(search_queue, seen):
     """
     Searches a dictionary of queues and checks to see if Kevin Bacon exists.
     If Kevin Bacon is found, return True and the path to get to him, otherwise
     check if the tweet is a retweet of a verified user and add that user to the
-    verified stack. If not, add any mentioned users to the queue. Repeat until
-    Kevin Bacon is found or the queues are empty.
+    verified stack. If not, add any mentioned users to the queue. Only a
+    sample of each page's users is added, the rest is deferred to the cold
+    queue, which is searched last. Repeat until Kevin Bacon is found or the
+    queues are empty. A mention of a user known to tweet Kevin Bacon ends the
+    search once no user above its depth is left to search, skipping the users
+    that could not lead to a shorter path.
 
     Args:
         search_queue: a dictionary of queues containing the users to search
@@ -93,12 +133,34 @@ def __search_queue__(search_queue, seen):
 
     """
 
-    while search_queue[VERIFIED] or search_queue[UNVERIFIED]:
+    # users still queued at each depth
+    queued = Counter(entry.depth for queue in search_queue.values()
+                     for entry in queue)
+
+    # path through the first mention of a user known to tweet Kevin Bacon,
+    # only taken once every user it could be longer than has been searched
+    goal_path = None
+
+    while search_queue[VERIFIED] or search_queue[UNVERIFIED] or \
+            search_queue[COLD]:
+        if goal_path and not any(queued[depth]
+                                 for depth in range(len(goal_path) - 1)):
+            break
+
         # get the current user to search
         if search_queue[VERIFIED]:
-            current_user = search_queue[VERIFIED].popleft()
+            current_user, current_depth = search_queue[VERIFIED].popleft()
+            queued[current_depth] -= 1
+        elif search_queue[UNVERIFIED]:
+            current_user, current_depth = search_queue[UNVERIFIED].popleft()
+            queued[current_depth] -= 1
         else:
-            current_user = search_queue[UNVERIFIED].popleft()
+            current_user, current_depth = search_queue[COLD].popleft()
+            queued[current_depth] -= 1
+
+        # a user this deep cannot lead to a path shorter than the goal
+        if goal_path and current_depth >= len(goal_path) - 1:
+            continue
 
         # queries twitter
         query = "from:%s" % current_user
@@ -106,46 +168,50 @@ def __search_queue__(search_queue, seen):
 
         # search through current users tweets
         try:
-            for tweet in tweets['statuses']:
-                if __contains_kevin_bacon__(tweet[TWEET_TEXT]):
-                    # mark Kevin Bacon as seen and generate path to him
-                    seen[KEVIN_BACON] =\
-                            (current_user, tweet['id'], tweet[TWEET_TEXT])
-                    path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
-                    return True, path_to_kevin_bacon, search_queue, seen
-
-                try:
-                    # find verified retweeted user and add to queue
-                    if tweet['retweeted_status']['user']['verified']:
-                        retweeted_user =\
-                            tweet['retweeted_status']['user']['screen_name']
-                        if retweeted_user in seen:
-                            continue
-
-                        # generate path and add retweeted user to seen
-                        path_to_mention =\
-                            (current_user, tweet['id'], tweet[TWEET_TEXT])
-                        seen[retweeted_user] = path_to_mention
-
-                        search_queue[VERIFIED].append(retweeted_user)
-                except (TypeError, KeyError):
-                    pass
-
-                # search for mentions to add to queue
-                for mention in tweet['entities']['user_mentions']:
-                    mentioned_user = mention['screen_name']
-                    if mentioned_user in seen:
-                        continue
-
-                    # generate path to mentioned user and add to seen
-                    path_to_mention =\
-                        (current_user, tweet['id'], tweet[TWEET_TEXT])
-                    seen[mentioned_user] = path_to_mention
-
-                    search_queue[UNVERIFIED].append(mentioned_user)
+            statuses = tweets['statuses']
+
+            # check the whole page for Kevin Bacon before expanding it
+            bacon_tweet = find_bacon_tweet(statuses)
+            if bacon_tweet:
+                # mark Kevin Bacon as seen and generate path to him
+                seen[KEVIN_BACON] = Edge(current_user, bacon_tweet['id'],
+                                         bacon_tweet[TWEET_TEXT])
+                path_to_kevin_bacon = \
+                        list(__generate_path__(seen, KEVIN_BACON))
+                if goal_path and len(goal_path) < len(path_to_kevin_bacon):
+                    path_to_kevin_bacon = goal_path
+                return True, path_to_kevin_bacon, search_queue, seen
+
+            new_mentions = __collect_mentions__(statuses, seen)
+
+            # remember the first mention of a user known to tweet Kevin Bacon
+            goal = None if goal_path else BACON_INDEX.first_goal(new_mentions)
+            if goal:
+                goal_user, tweet = goal[0], goal[1]
+                goal_path = list(__generate_path__(seen, current_user))
+                goal_path.append(
+                    Edge(current_user, tweet['id'], tweet[TWEET_TEXT]))
+                goal_path.append(BACON_INDEX.tweet(goal_user))
+
+            # add a sample of unseen verified retweets and mentions to their
+            # queues, and defer the rest to the cold queue
+            hot, cold = split_mentions(new_mentions)
+            cold = [(mentioned_user, tweet, COLD)
+                    for mentioned_user, tweet, _ in cold]
+            for mentioned_user, tweet, priority in hot + cold:
+                # generate path to mentioned user and add to seen
+                path_to_mention =\
+                        Edge(current_user, tweet['id'], tweet[TWEET_TEXT])
+                seen[mentioned_user] = path_to_mention
+
+                search_queue[priority].append(
+                    FrontierEntry(mentioned_user, current_depth + 1))
+                queued[current_depth + 1] += 1
         except TypeError:
             pass
 
+    if goal_path:
+        return True, goal_path, search_queue, seen
     return False, [], search_queue, seen
 
 
@@ -163,17 +229,22 @@ def search_for_kevin_bacon(start):
     """
     search_queue = {
         VERIFIED: deque(),
-        UNVERIFIED: deque()
+        UNVERIFIED: deque(),
+        COLD: deque()
     }
-    search_queue[UNVERIFIED].append(start)
+    search_queue[UNVERIFIED].append(FrontierEntry(start, 0))
     seen = {start: None}
 
+    # the start user may be known to have tweeted Kevin Bacon
+    if start in BACON_INDEX:
+        return [BACON_INDEX.tweet(start)]
+
     found, search_results, search_queue, seen = \
         __search_queue__(search_queue, seen)
     if found:
         return search_results
 
-    print 'No connection to Kevin Bacon'
+    print('No connection to Kevin Bacon')
     sys.exit(0)
 
 
@@ -181,15 +252,18 @@ def main():
     """ main function to execute to run agent """
     if len(sys.argv) != 2:
         sys.exit("Invalid Argument Exception\n" + \
-                 "Usage: python2 kb.py <twitter_user>")
+                 "Usage: python3 kb.py <twitter_user>")
 
     # connection to Twitter API
     TWITTER.connect_to_twitter()
 
+    # seed the users known to have tweeted Kevin Bacon
+    BACON_INDEX.refresh(TWITTER)
+
     # prints resutls of search
     for tweet in search_for_kevin_bacon(sys.argv[1]):
         user, tweet_id, tweet_text = tweet
-        print "%s, %d, %s" % (user, tweet_id, tweet_text)
+        print("%s, %d, %s" % (user, tweet_id, tweet_text))
 
 
 if __name__ == '__main__':
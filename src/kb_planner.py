@@ -0,0 +1,240 @@
+"""
+Six Degrees of Kevin Bacon
+Author: Chris Lim
+Date: 2/28/18
+
+This intelligent agent determines how far a given individual is from following
+Kevin Bacon on Twitter. The agent is limited to using the search() function
+from the Twython API.
+
+Every search runs within a budget of search calls, wall time and rate limit
+windows. Without a budget the level-synchronous breadth-first search of
+kb_bfs_level.py is used as is. With a budget, each level is searched starting
+from its most mentioned users, so the calls that can be afforded go to the
+most connected part of the frontier. A search that runs out of budget stops
+and reports how deep it searched and the path to its most promising lead.
+"""
+
+
+import sys
+import time
+import getopt
+import numpy as np
+from kb_bfs_level import TWITTER, BACON_INDEX, SearchGraph, \
+        __search_level__, __fetch_timeline__
+from threaded_twitter_wrapper import ACCOUNTS
+
+
+# search calls one account can make in a rate limit window
+CALLS_PER_WINDOW = 450
+
+FOUND = 'found'
+NO_CONNECTION = 'no connection'
+OUT_OF_BUDGET = 'not found within budget'
+
+BREADTH_FIRST = 'breadth-first'
+MOST_MENTIONED_FIRST = 'most-mentioned-first'
+
+
+class Budget(object):
+    """
+    Limits on the resources a single search may use. A limit of None is
+    unlimited. Rate limit windows are converted to search calls using the
+    number of accounts in the pool.
+
+    Attribute(s):
+        max_calls (int): largest number of search calls
+        max_seconds (float): longest wall time in seconds
+        calls (int): search calls made so far
+        started (float): time the search started, or None before it starts
+    """
+    def __init__(self, max_calls=None, max_seconds=None, max_windows=None):
+        if max_windows is not None:
+            window_calls = \
+                max_windows * CALLS_PER_WINDOW * max(1, len(ACCOUNTS))
+            if max_calls is None or window_calls < max_calls:
+                max_calls = window_calls
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.calls = 0
+        self.started = None
+
+
+    def start(self):
+        """ starts the wall time of the search """
+        self.started = time.time()
+
+
+    @property
+    def limited(self):
+        """(bool) Returns whether any limit is set"""
+        return self.max_calls is not None or self.max_seconds is not None
+
+
+    @property
+    def elapsed(self):
+        """(float) Returns the seconds since the search started"""
+        if self.started is None:
+            return 0.0
+        return time.time() - self.started
+
+
+    def exhausted(self):
+        """(bool) Returns whether the search may not make another call"""
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            return True
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return True
+        return False
+
+
+class PlanResult(object):
+    """
+    Data class that stores the outcome of a budgeted search.
+
+    Attribute(s):
+        status: FOUND, NO_CONNECTION or OUT_OF_BUDGET
+        path: the path to Kevin Bacon, or to the most promising lead if the
+              budget ran out
+        depth: number of levels searched completely
+        calls: search calls made
+        seconds: wall time of the search
+        strategy: the strategy used
+    """
+    def __init__(self, status, path, depth, calls, seconds, strategy):
+        self.status = status
+        self.path = path
+        self.depth = depth
+        self.calls = calls
+        self.seconds = seconds
+        self.strategy = strategy
+
+
+def __choose_strategy__(budget):
+    """
+    Chooses how to search within a budget.
+
+    Args:
+        budget: the Budget of the search
+
+    Return:
+        BREADTH_FIRST when the budget is unlimited, MOST_MENTIONED_FIRST
+        otherwise
+
+    """
+    if budget.limited:
+        return MOST_MENTIONED_FIRST
+    return BREADTH_FIRST
+
+
+def search_with_budget(start, budget, fetch=None):
+    """
+    Searches for Kevin Bacon from a given user one level at a time until he
+    is found, the frontier is empty or the budget runs out. The wall time of
+    the budget starts with the search. A search that searched every user it
+    found has no connection, even if it used up the budget doing so.
+
+    Args:
+        start: a twitter user to start searching for Kevin Bacon from
+        budget: the Budget of the search
+        fetch: function returning the search results for a user, defaults to
+               querying Twitter
+
+    Returns:
+        A PlanResult of the search
+
+    """
+    fetch = fetch or __fetch_timeline__
+    strategy = __choose_strategy__(budget)
+    budget.start()
+    expanded = set()
+    refused = set()
+
+    def budgeted_fetch(user):
+        """ fetches a user unless the budget has run out """
+        if budget.exhausted():
+            refused.add(user)
+            return None
+        budget.calls += 1
+        expanded.add(user)
+        return fetch(user)
+
+    if start in BACON_INDEX:
+        return PlanResult(FOUND, [BACON_INDEX.tweet(start)], 0, budget.calls,
+                          budget.elapsed, strategy)
+
+    graph = SearchGraph()
+    frontier = graph.intern([start])
+    graph.visited[frontier] = True
+    depth = 0
+
+    while len(frontier):
+        if strategy == MOST_MENTIONED_FIRST:
+            order = np.argsort(-graph.mentioned[frontier], kind='mergesort')
+            frontier = frontier[order]
+
+        found, search_results, frontier = \
+            __search_level__(frontier, graph, budgeted_fetch)
+        if found:
+            return PlanResult(FOUND, search_results, depth, budget.calls,
+                              budget.elapsed, strategy)
+        if not len(frontier) and not refused:
+            return PlanResult(NO_CONNECTION, [], depth + 1, budget.calls,
+                              budget.elapsed, strategy)
+        if refused or budget.exhausted():
+            break
+        depth += 1
+
+    # the most mentioned user that was found but never searched
+    leads = np.flatnonzero(graph.visited)
+    leads = [lead for lead in leads if graph.names[lead] not in expanded]
+    path_to_lead = []
+    if leads:
+        lead = max(leads, key=lambda user_id: graph.mentioned[user_id])
+        path_to_lead = graph.path(lead)
+    return PlanResult(OUT_OF_BUDGET, path_to_lead, depth, budget.calls,
+                      budget.elapsed, strategy)
+
+
+def main():
+    """ main function to execute to run agent """
+    usage = "Invalid Argument Exception\n" + \
+            "Usage: python3 kb_planner.py [--calls N] [--seconds N] " + \
+            "[--windows N] <twitter_user>"
+    try:
+        options, arguments = \
+            getopt.getopt(sys.argv[1:], '', ['calls=', 'seconds=', 'windows='])
+    except getopt.GetoptError:
+        sys.exit(usage)
+    if len(arguments) != 1:
+        sys.exit(usage)
+
+    limits = dict((option[2:], float(value)) for option, value in options)
+    budget = Budget(max_calls=limits.get('calls'),
+                    max_seconds=limits.get('seconds'),
+                    max_windows=limits.get('windows'))
+
+    # connection to Twitter API
+    TWITTER.connect_to_twitter()
+
+    # seed the users known to have tweeted Kevin Bacon
+    BACON_INDEX.refresh(TWITTER)
+
+    result = search_with_budget(arguments[0], budget)
+    if result.status == NO_CONNECTION:
+        print('No connection to Kevin Bacon')
+    elif result.status == OUT_OF_BUDGET:
+        print("Not found within budget, searched %d levels" % result.depth)
+        if result.path:
+            print("Most promising lead:")
+
+    # prints resutls of search
+    for tweet in result.path:
+        user, tweet_id, tweet_text = tweet
+        print("%s, %d, %s" % (user, tweet_id, tweet_text))
+
+    print("--- %s seconds, %d calls, %s ---" %
+          (result.seconds, result.calls, result.strategy))
+
+if __name__ == '__main__':
+    main()
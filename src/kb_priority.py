@@ -12,11 +12,18 @@ from the Twython API.
 import sys
 from collections import deque
 from threaded_twitter_wrapper import TwitterConnection
+from fanout import COLD, split_mentions
+from bacon_index import BaconIndex
+from records import Edge, FrontierEntry
+from bacon_pattern import find_bacon_tweet
 
 
 # open connection to Twitter API
 TWITTER = TwitterConnection()
 
+# users known to have tweeted Kevin Bacon
+BACON_INDEX = BaconIndex()
+
 KEVIN_BACON = 'Kevin Bacon'
 TWEET_TEXT = 'full_text'
 VERIFIED = 'verified'
@@ -29,28 +36,6 @@ UNVERIFIED = 'unverified'
 SHAFTER_LIMIT = 15
 
 
-def __contains_kevin_bacon__(tweet):
-    """
-    Check if a tweet contains Kevin Bacon, Kevin_Bacon, or KevinBacon (case
-    insensitive).
-
-    Args:
-        tweet: tweet text
-
-    Return:
-        True if the tweet text contains a form of "Kevin Bacon"
-
-    """
-    tweet_text = tweet.lower()
-    if "kevin bacon" in tweet_text:
-        return True
-    if "kevin_bacon" in tweet_text:
-        return True
-    if "kevinbacon" in tweet_text:
-        return True
-    return False
-
-
 def __generate_path__(seen, user):
     """
     Generates the path to a user.
@@ -74,18 +59,70 @@ def __generate_path__(seen, user):
     return reversed(path_to_bacon)
 
 
+def __verified_retweet__(tweet):
+    """
+    Finds the author of a retweet if that author is a verified user.
+
+    Args:
+        tweet: a tweet returned by a search call
+
+    Return:
+        The screen name of the verified retweeted user, or None
+
+    """
+    try:
+        if tweet['retweeted_status']['user']['verified']:
+            return tweet['retweeted_status']['user']['screen_name']
+    except (TypeError, KeyError):
+        pass
+    return None
+
+
+def __collect_mentions__(statuses, seen):
+    """
+    Extracts the verified retweeted users and the mentions from every tweet on
+    a page and checks them against the seen users in bulk.
+
+    Args:
+        statuses: list of tweets returned by a search call
+        seen: a dictionary containing what twitter users have been seen and
+              their predecessor
+
+    Return:
+        A list of (user, tweet, priority) triples for users that have not been
+        seen, in the order they were first found on the page
+
+    """
+    mentions = []
+    for tweet in statuses:
+        retweeted_user = __verified_retweet__(tweet)
+        if retweeted_user:
+            mentions.append((retweeted_user, tweet, VERIFIED))
+        for mention in tweet['entities']['user_mentions']:
+            mentions.append((mention['screen_name'], tweet, UNVERIFIED))
+    unseen = set(user for user, _, _ in mentions).difference(seen)
+
+    new_mentions = []
+    for mention in mentions:
+        if mention[0] in unseen:
+            unseen.discard(mention[0])
+            new_mentions.append(mention)
+    return new_mentions
+
+
 def __search_stack__(search_stack, seen, depth_limit):
     """
     Searches a given dictionary of stacks and checks to see if Kevin Bacon
     exists. If Kevin Bacon is found, return True and the path to get to him,
     otherwise check if the tweet is a retweet from a verified user and add
     that user to the verified stack. If it is not a retweet nor a verified
-    user, add any mentioned users to the stack. Repeat until Kevin Bacon is
-    found or the stacks are empty.
+    user, add any mentioned users to the stack. Only a sample of each page's
+    users is added, the rest is deferred to the cold stack, which is searched
+    last. Repeat until Kevin Bacon is found or the stacks are empty.
 
     Args:
-        search_stack: a dictionary containing a verified and unverified stack
-                      containing the users to search through
+        search_stack: a dictionary containing a verified, unverified and cold
+                      stack containing the users to search through
         seen: a dictionary containing what twitter users have been seen and
               their predecessor
         depth_limit: a limit for how deep from the root to search
@@ -99,26 +136,36 @@ def __search_stack__(search_stack, seen, depth_limit):
     exceeds_depth_stack = {
         VERIFIED: deque(),
         UNVERIFIED: deque(),
+        COLD: deque(),
     }
 
-    while (search_stack[VERIFIED] or search_stack[UNVERIFIED]):
+    while (search_stack[VERIFIED] or search_stack[UNVERIFIED] or
+           search_stack[COLD]):
         # get the current user to search
         if search_stack[VERIFIED]:
             current_user, current_depth = search_stack[VERIFIED].pop()
             # check if depth is greater than the provided depth limit
             # for VERIFIED users
             if current_depth > depth_limit:
-                current = (current_user, current_depth)
+                current = FrontierEntry(current_user, current_depth)
                 exceeds_depth_stack[VERIFIED].append(current)
                 continue
-        else:
+        elif search_stack[UNVERIFIED]:
             current_user, current_depth = search_stack[UNVERIFIED].pop()
             # check if depth is greater than the provided depth limit
             # for UNVERIFIED users
             if current_depth > depth_limit:
-                current = (current_user, current_depth)
+                current = FrontierEntry(current_user, current_depth)
                 exceeds_depth_stack[UNVERIFIED].append(current)
                 continue
+        else:
+            current_user, current_depth = search_stack[COLD].pop()
+            # check if depth is greater than the provided depth limit
+            # for deferred users
+            if current_depth > depth_limit:
+                current = FrontierEntry(current_user, current_depth)
+                exceeds_depth_stack[COLD].append(current)
+                continue
 
 
         # queries twitter
@@ -127,45 +174,42 @@ def __search_stack__(search_stack, seen, depth_limit):
 
         # search through current users tweets
         try:
-            for tweet in tweets['statuses']:
-                if __contains_kevin_bacon__(tweet[TWEET_TEXT]):
-                    # mark Kevin Bacon as seen and generate path to him
-                    seen[KEVIN_BACON] =\
-                        (current_user, tweet['id'], tweet[TWEET_TEXT])
-                    path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
-                    return True, path_to_kevin_bacon, search_stack, seen
-
-                try:
-                    # find verified retweeted user and add to stack
-                    if tweet['retweeted_status']['user']['verified']:
-                        retweeted_user =\
-                                tweet['retweeted_status']['user']['screen_name']
-                        if retweeted_user in seen:
-                            continue
-
-                        # generate path and add retweeted user to seen
-                        path_to_mention =\
-                                (current_user, tweet['id'], tweet[TWEET_TEXT])
-                        seen[retweeted_user] = path_to_mention
-
-                        search_stack[VERIFIED]\
-                                .append((retweeted_user, current_depth + 1))
-                except (TypeError, KeyError):
-                    pass
-
-                # search for mentions to add to stack
-                for mention in tweet['entities']['user_mentions']:
-                    mentioned_user = mention['screen_name']
-                    if mentioned_user in seen:
-                        continue
-
-                    #generate path to mentioned user and add to seen
-                    path_to_mention =\
-                            (current_user, tweet['id'], tweet[TWEET_TEXT])
-                    seen[mentioned_user] = path_to_mention
-
-                    search_stack[UNVERIFIED]\
-                            .append((mentioned_user, current_depth + 1))
+            statuses = tweets['statuses']
+
+            # check the whole page for Kevin Bacon before expanding it
+            bacon_tweet = find_bacon_tweet(statuses)
+            if bacon_tweet:
+                # mark Kevin Bacon as seen and generate path to him
+                seen[KEVIN_BACON] = Edge(current_user, bacon_tweet['id'],
+                                         bacon_tweet[TWEET_TEXT])
+                path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
+                return True, path_to_kevin_bacon, search_stack, seen
+
+            new_mentions = __collect_mentions__(statuses, seen)
+
+            # stop at the first mention of a user known to tweet Kevin Bacon
+            goal = BACON_INDEX.first_goal(new_mentions)
+            if goal:
+                goal_user, tweet = goal[0], goal[1]
+                seen[goal_user] = \
+                        Edge(current_user, tweet['id'], tweet[TWEET_TEXT])
+                seen[KEVIN_BACON] = BACON_INDEX.tweet(goal_user)
+                path_to_kevin_bacon = __generate_path__(seen, KEVIN_BACON)
+                return True, path_to_kevin_bacon, search_stack, seen
+
+            # add a sample of unseen verified retweets and mentions to their
+            # stacks, and defer the rest to the cold stack
+            hot, cold = split_mentions(new_mentions)
+            cold = [(mentioned_user, tweet, COLD)
+                    for mentioned_user, tweet, _ in cold]
+            for mentioned_user, tweet, priority in hot + cold:
+                # generate path to mentioned user and add to seen
+                path_to_mention =\
+                        Edge(current_user, tweet['id'], tweet[TWEET_TEXT])
+                seen[mentioned_user] = path_to_mention
+
+                search_stack[priority].append(
+                    FrontierEntry(mentioned_user, current_depth + 1))
         except TypeError:
             pass
 
@@ -187,10 +231,15 @@ def search_for_kevin_bacon(start):
     """
     search_stack = {
         VERIFIED: deque(),
-        UNVERIFIED: deque()
+        UNVERIFIED: deque(),
+        COLD: deque()
     }
-    search_stack[UNVERIFIED].append((start, 0))
+    search_stack[UNVERIFIED].append(FrontierEntry(start, 0))
     seen = {start: None}
+
+    # the start user may be known to have tweeted Kevin Bacon
+    if start in BACON_INDEX:
+        return [BACON_INDEX.tweet(start)]
     depth_limit = 3
 
     while depth_limit <= SHAFTER_LIMIT:
@@ -202,7 +251,7 @@ def search_for_kevin_bacon(start):
         # if Kevin Bacon is not found increase depth
         depth_limit += 2
 
-    print 'No connection to Kevin Bacon'
+    print('No connection to Kevin Bacon')
     sys.exit(0)
 
 
@@ -210,15 +259,18 @@ def main():
     """ main function to execute to run agent """
     if len(sys.argv) != 2:
         sys.exit("Invalid Argument Exception\n" + \
-                 "Usage: python2 kb.py <twitter_user>")
+                 "Usage: python3 kb.py <twitter_user>")
 
     # connection to Twitter API
     TWITTER.connect_to_twitter()
 
+    # seed the users known to have tweeted Kevin Bacon
+    BACON_INDEX.refresh(TWITTER)
+
     # prints resutls of search
     for tweet in search_for_kevin_bacon(sys.argv[1]):
         user, tweet_id, tweet_text = tweet
-        print "%s, %d, %s" % (user, tweet_id, tweet_text)
+        print("%s, %d, %s" % (user, tweet_id, tweet_text))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,318 @@
+"""
+Six Degrees of Kevin Bacon
+Author: Chris Lim
+Date: 2/28/18
+
+This module runs the agent as a long running local HTTP service. The Twitter
+connection, the fetched timelines and the found paths stay in memory between
+requests, so repeated and overlapping lookups do not pay for a new process,
+a new OAuth token or a cold cache. Searches use the level-synchronous
+breadth-first search of kb_bfs_level.py.
+
+Expired timelines are refreshed with since_id, and a cached path is dropped
+whenever a user that its search expanded gets new tweets.
+
+Search calls are made through a FairScheduler over the whole account pool.
+Each lookup is made on behalf of a tenant, so one tenant's long crawl shares
+the pool fairly with the short lookups of the others. Tenant weights and
+quotas are set with KB_TENANTS, as comma separated name[:weight[:quota]].
+
+    GET /path?user=<twitter_user>[&tenant=<name>][&priority=high|normal|low]
+                                    path from the user to Kevin Bacon
+    GET /stats                      cache and tenant metrics
+"""
+
+
+import os
+import sys
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from kb_bfs_level import TWITTER, BACON_INDEX, find_kevin_bacon
+from timeline_cache import CoalescingCache, TimelineCache
+from scheduler import FairScheduler, pooled_connections, DEFAULT_TENANT, \
+        NORMAL, PRIORITIES
+
+
+HOST = '127.0.0.1'
+PORT = 8080
+
+# seconds a fetched timeline or a found path is reused
+TIMELINE_TTL = 60 * 60
+PATH_TTL = 60 * 60
+
+# seconds a failed timeline, or a path not found because of one, is reused
+FAILED_TTL = 60
+
+# seconds between refreshes of the index of users who tweeted Kevin Bacon
+INDEX_TTL = 60 * 60
+
+# tenant the index refreshes are made as, and its share of the calls unless
+# KB_TENANTS sets one
+INDEX_TENANT = 'bacon_index'
+INDEX_WEIGHT = 0.1
+
+# tenant weights and quotas, as comma separated name[:weight[:quota]]
+TENANTS = os.environ.get('KB_TENANTS', '')
+
+# shares the account pool between requests, started by main
+SCHEDULER = None
+
+# tenant and priority of the request handled by the current thread
+REQUEST = threading.local()
+
+
+# users whose cached paths depend on the timeline of each user, and the
+# users expanded by the cached search of each user
+DEPENDENTS = {}
+EXPANDED = {}
+DEPENDENTS_LOCK = threading.Lock()
+
+
+def __search_twitter__(query, since_id=None):
+    """
+    Makes a search call to Twitter through the scheduler, on behalf of the
+    tenant of the current request.
+
+    Args:
+        query: the query made to Twitter
+        since_id: only return tweets newer than this tweet id
+
+    Return:
+        The results of the search call made to Twitter
+
+    """
+    return SCHEDULER.submit(getattr(REQUEST, 'tenant', DEFAULT_TENANT),
+                            query, since_id=since_id,
+                            priority=getattr(REQUEST, 'priority', NORMAL))
+
+
+def __forget_searches__(starts):
+    """
+    Drops the dependencies of searches whose paths are no longer cached. The
+    dependents lock must be held.
+
+    Args:
+        starts: twitter users the searches started from
+
+    """
+    for start in starts:
+        for name in EXPANDED.pop(start, ()):
+            dependents = DEPENDENTS.get(name)
+            if dependents is None:
+                continue
+            dependents.discard(start)
+            if not dependents:
+                del DEPENDENTS[name]
+
+
+def __invalidate_paths__(user):
+    """
+    Drops the cached paths of every search that expanded a user, since new
+    tweets by that user can add mentions or a Kevin Bacon tweet.
+
+    Args:
+        user: twitter user with new tweets
+
+    """
+    with DEPENDENTS_LOCK:
+        dependents = DEPENDENTS.pop(user, set())
+        __forget_searches__(dependents)
+    for start in dependents:
+        PATHS.invalidate(start)
+
+
+TIMELINES = TimelineCache(__search_twitter__, TIMELINE_TTL,
+                          __invalidate_paths__, FAILED_TTL)
+
+
+def __find_path__(user):
+    """
+    Searches for the path from a user to Kevin Bacon over the shared timeline
+    cache.
+
+    Args:
+        user: a twitter user to start searching for Kevin Bacon from
+
+    Return:
+        The path to get to Kevin Bacon, or None if none is found, and whether
+        every timeline the search expanded was fetched
+
+    """
+    # the search replaces the user's own, and expired paths are dropped
+    expired = PATHS.evict_expired()
+    with DEPENDENTS_LOCK:
+        __forget_searches__(expired + [user])
+
+    expanded = set()
+    failed = set()
+
+    def fetch(name):
+        """ fetches a cached timeline and records the expanded user """
+        expanded.add(name)
+        timeline = TIMELINES.get(name)
+        if not isinstance(timeline, dict):
+            failed.add(name)
+        return timeline
+
+    path_to_kevin_bacon = find_kevin_bacon(user, fetch)
+    with DEPENDENTS_LOCK:
+        EXPANDED[user] = expanded
+        for name in expanded:
+            DEPENDENTS.setdefault(name, set()).add(user)
+    return path_to_kevin_bacon, not failed
+
+
+# a path not found because a timeline failed is searched for again soon
+PATHS = CoalescingCache(__find_path__, PATH_TTL,
+                        lambda found: found[0] is None and not found[1],
+                        FAILED_TTL)
+
+
+class BaconRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers path and stats requests with JSON.
+    """
+
+    def do_GET(self):
+        """ handles a GET request """
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self.__send__(200, {'timelines': TIMELINES.stats(),
+                                'paths': PATHS.stats(),
+                                'tenants': SCHEDULER.stats()})
+            return
+
+        if url.path != '/path':
+            self.__send__(404, {'error': 'unknown path %s' % url.path})
+            return
+
+        params = parse_qs(url.query)
+        users = params.get('user')
+        if not users:
+            self.__send__(400, {'error': 'missing user'})
+            return
+        priority = params.get('priority', ['normal'])[0]
+        if priority not in PRIORITIES:
+            self.__send__(400, {'error': 'unknown priority %s' % priority})
+            return
+        REQUEST.tenant = params.get('tenant', [DEFAULT_TENANT])[0]
+        REQUEST.priority = PRIORITIES[priority]
+
+        start = time.time()
+        path_to_kevin_bacon, _ = PATHS.get(users[0])
+        self.__send__(200, {
+            'user': users[0],
+            'found': path_to_kevin_bacon is not None,
+            'path': [{'user': user, 'id': tweet_id, 'text': tweet_text}
+                     for user, tweet_id, tweet_text in
+                     path_to_kevin_bacon or []],
+            'seconds': time.time() - start,
+        })
+
+
+    def __send__(self, status, body):
+        """
+        Sends a JSON response.
+
+        Args:
+            status: HTTP status code
+            body: object to encode as JSON
+        """
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class BaconServer(ThreadingHTTPServer):
+    """
+    HTTP server handling each request in its own thread.
+    """
+    daemon_threads = True
+
+
+def __parse_tenants__(tenants):
+    """
+    Parses tenant weights and quotas.
+
+    Args:
+        tenants: comma separated name[:weight[:quota]], a bare name has a
+                 weight of 1
+
+    Return:
+        A list of (name, weight, quota) tuples
+
+    """
+    parsed = []
+    for tenant in tenants.split(','):
+        if not tenant.strip():
+            continue
+        fields = tenant.strip().split(':')
+        weight = float(fields[1]) if len(fields) > 1 else 1.0
+        quota = int(fields[2]) if len(fields) > 2 else None
+        if weight <= 0:
+            raise ValueError("tenant %s weight must be positive, not %s"
+                             % (fields[0], weight))
+        if quota is not None and quota < 1:
+            raise ValueError("tenant %s quota must be at least 1, not %s"
+                             % (fields[0], quota))
+        parsed.append((fields[0], weight, quota))
+    return parsed
+
+
+def __index_refresher__():
+    """
+    Refreshes the index of users known to have tweeted Kevin Bacon every
+    INDEX_TTL seconds, as a tenant with a small share of the calls.
+    """
+    connection = SCHEDULER.connection(INDEX_TENANT)
+    while SCHEDULER.running:
+        time.sleep(INDEX_TTL)
+        BACON_INDEX.refresh(connection)
+
+
+def main():
+    """ main function to run the server """
+    global SCHEDULER
+    if len(sys.argv) > 2:
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 kb_server.py [port]")
+
+    port = int(sys.argv[1]) if len(sys.argv) == 2 else PORT
+
+    # connection to Twitter API
+    TWITTER.connect_to_twitter()
+
+    # seed the users known to have tweeted Kevin Bacon
+    BACON_INDEX.refresh(TWITTER)
+
+    try:
+        tenants = __parse_tenants__(TENANTS)
+    except ValueError as error:
+        sys.exit("Invalid Tenant Exception\n%s\n" % error + \
+                 "Usage: KB_TENANTS=name[:weight[:quota]],...")
+
+    SCHEDULER = FairScheduler(pooled_connections(TWITTER))
+    SCHEDULER.tenant(INDEX_TENANT, INDEX_WEIGHT)
+    for name, weight, quota in tenants:
+        SCHEDULER.tenant(name, weight, quota)
+
+    index_refresher = threading.Thread(target=__index_refresher__)
+    index_refresher.daemon = True
+    index_refresher.start()
+
+    server = BaconServer((HOST, port), BaconRequestHandler)
+    print("--- serving on http://%s:%d ---" % (HOST, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        SCHEDULER.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""
+Six Degrees of Kevin Bacon
+Author: Chris Lim
+Date: 2/28/18
+
+This intelligent agent determines how far a given individual is from following
+Kevin Bacon on Twitter. The agent is limited to using the search() function
+from the Twython API.
+
+The breadth-first search is sharded over several worker processes. Each worker
+owns the screen names that hash to it, keeps its own seen dictionary and
+queries Twitter with its own slice of the accounts. Mentions are sent to the
+worker owning them, and a coordinator steps every worker through the search
+one level at a time until Kevin Bacon is found.
+"""
+
+
+import sys
+import time
+import zlib
+from queue import Empty
+from multiprocessing import Process, Queue, Event, cpu_count
+from threaded_twitter_wrapper import TwitterConnection, ACCOUNTS
+from records import Edge
+from bacon_pattern import find_bacon_tweet
+
+
+TWEET_TEXT = 'full_text'
+
+# commands sent from the coordinator to the workers
+SEED = 'seed'
+LEVEL = 'level'
+LOOKUP = 'lookup'
+STOP = 'stop'
+
+# reply of a worker that raised an exception
+FAILED = 'failed'
+
+# seconds the coordinator waits for a reply before checking on the workers
+REPLY_TIMEOUT = 5
+
+# seconds a worker is given to stop before it is terminated
+STOP_TIMEOUT = 5
+
+# number of worker processes when none is given
+SHARDS = cpu_count()
+
+
+def __owner__(user, shards):
+    """
+    Finds the worker that owns a screen name. A checksum is used instead of
+    hash() so every process agrees on the owner.
+
+    Args:
+        user: screen name of a twitter user
+        shards: number of workers
+
+    Return:
+        The index of the worker owning the user
+
+    """
+    return (zlib.crc32(user.encode('utf-8')) & 0xffffffff) % shards
+
+
+def __expand_level__(twitter, frontier, shards, found):
+    """
+    Fetches the tweets of every user a worker owns in the current level and
+    checks to see if Kevin Bacon exists. Mentions are grouped by the worker
+    that owns them.
+
+    Args:
+        twitter: the worker's TwitterConnection
+        frontier: list of users to search in this level
+        shards: number of workers
+        found: event set by any worker that finds Kevin Bacon
+
+    Returns:
+        The Kevin Bacon tweet as (user, id, text) or None, and a list of
+        (mentioned user, predecessor) batches, one for each worker
+
+    """
+    outgoing = [[] for _ in range(shards)]
+    sent = set()
+
+    for current_user in frontier:
+        # another worker already found Kevin Bacon in this level
+        if found.is_set():
+            break
+
+        # queries twitter
+        query = "from:%s" % current_user
+        tweets = twitter.search_twitter(query)
+
+        # search through current users tweets
+        try:
+            statuses = tweets['statuses']
+
+            # check the whole page for Kevin Bacon before expanding it
+            bacon_tweet = find_bacon_tweet(statuses)
+            if bacon_tweet:
+                found.set()
+                return Edge(current_user, bacon_tweet['id'],
+                            bacon_tweet[TWEET_TEXT]), outgoing
+
+            # send each mention to the worker owning it
+            for tweet in statuses:
+                for mention in tweet['entities']['user_mentions']:
+                    mentioned_user = mention['screen_name']
+                    if mentioned_user in sent:
+                        continue
+                    sent.add(mentioned_user)
+
+                    path_to_mention =\
+                            Edge(current_user, tweet['id'], tweet[TWEET_TEXT])
+                    outgoing[__owner__(mentioned_user, shards)]\
+                            .append((mentioned_user, path_to_mention))
+        except (TypeError, KeyError):
+            pass
+
+    return None, outgoing
+
+
+def __shard_worker__(shard, shards, accounts, inboxes, control, results,
+                     found):
+    """
+    Runs a worker that owns one partition of the screen names. The worker
+    waits for commands from the coordinator, searches its part of each level,
+    exchanges mentions with the other workers and reports back. An exception
+    is reported to the coordinator instead of leaving it waiting.
+
+    Args:
+        shard: index of this worker
+        shards: number of workers
+        accounts: credentials used by this worker
+        inboxes: a queue of mention batches for every worker
+        control: queue of commands from the coordinator
+        results: queue of replies to the coordinator
+        found: event set by any worker that finds Kevin Bacon
+
+    """
+    try:
+        # every worker opening KB_TRACE would corrupt it, and a sharded search
+        # cannot be replayed, so the workers do not record
+        twitter = TwitterConnection(accounts, trace_path=None)
+        twitter.connect_to_twitter()
+
+        seen = {}
+        frontier = []
+
+        while True:
+            command = control.get()
+
+            if command[0] == STOP:
+                break
+
+            if command[0] == SEED:
+                seen[command[1]] = None
+                frontier = [command[1]]
+                continue
+
+            if command[0] == LOOKUP:
+                results.put((LOOKUP, command[1], seen.get(command[1])))
+                continue
+
+            # search this worker's part of the level
+            level = command[1]
+            hit, outgoing = __expand_level__(twitter, frontier, shards, found)
+            for target in range(shards):
+                inboxes[target].put((level, outgoing[target]))
+
+            # every worker sends one batch to every worker per level
+            frontier = []
+            for _ in range(shards):
+                batch_level, batch = inboxes[shard].get()
+                assert batch_level == level
+                for mentioned_user, path_to_mention in batch:
+                    if mentioned_user in seen:
+                        continue
+                    seen[mentioned_user] = path_to_mention
+                    frontier.append(mentioned_user)
+
+            results.put((LEVEL, shard, hit, len(frontier)))
+    except Exception as error:
+        results.put((FAILED, shard, repr(error)))
+
+
+def __reply__(results, workers):
+    """
+    Waits for the next reply from the workers. A worker that failed or exited
+    fails the search, since the other workers would wait on it forever.
+
+    Args:
+        results: queue of replies from the workers
+        workers: the worker processes
+
+    Return:
+        The reply of a worker
+
+    """
+    while True:
+        try:
+            reply = results.get(timeout=REPLY_TIMEOUT)
+        except Empty:
+            for shard, worker in enumerate(workers):
+                if not worker.is_alive():
+                    raise RuntimeError("worker %d exited with code %s"
+                                       % (shard, worker.exitcode))
+            continue
+        if reply[0] == FAILED:
+            raise RuntimeError("worker %d failed: %s" % reply[1:])
+        return reply
+
+
+def __generate_path__(controls, results, workers, bacon_tweet):
+    """
+    Generates the path to Kevin Bacon by asking the owner of each user for
+    its predecessor.
+
+    Args:
+        controls: command queue of every worker
+        results: queue of replies from the workers
+        workers: the worker processes
+        bacon_tweet: the (user, id, text) tweet containing Kevin Bacon
+
+    Return:
+        A list of the path from the start user to Kevin Bacon
+
+    """
+    path_to_bacon = [bacon_tweet]
+    user = bacon_tweet[0]
+    while True:
+        controls[__owner__(user, len(workers))].put((LOOKUP, user))
+        _, _, predecessor = __reply__(results, workers)
+        if not predecessor:
+            break
+        path_to_bacon.append(predecessor)
+        user = predecessor[0]
+    path_to_bacon.reverse()
+    return path_to_bacon
+
+
+def search_for_kevin_bacon(start, shards=SHARDS):
+    """
+    Starts the workers, seeds the owner of a given user and steps all workers
+    through the search one level at a time. If Kevin Bacon is found return
+    the search results. A RuntimeError is raised if a worker fails or exits.
+
+    Args:
+        start: a twitter user to start searching for Kevin Bacon from
+        shards: number of worker processes, limited to the number of accounts
+
+    Returns:
+        The path to get to Kevin Bacon unless none is found
+
+    """
+    shards = max(1, min(shards, len(ACCOUNTS)))
+    inboxes = [Queue() for _ in range(shards)]
+    controls = [Queue() for _ in range(shards)]
+    results = Queue()
+    found = Event()
+
+    workers = []
+    for shard in range(shards):
+        worker = Process(target=__shard_worker__,
+                         args=(shard, shards, ACCOUNTS[shard::shards],
+                               inboxes, controls[shard], results, found))
+        worker.start()
+        workers.append(worker)
+
+    try:
+        controls[__owner__(start, shards)].put((SEED, start))
+
+        level = 0
+        while True:
+            for control in controls:
+                control.put((LEVEL, level))
+
+            # wait for every worker to complete the level
+            hits = []
+            frontier_size = 0
+            for _ in range(shards):
+                _, _, hit, size = __reply__(results, workers)
+                if hit:
+                    hits.append(hit)
+                frontier_size += size
+
+            if hits:
+                return __generate_path__(controls, results, workers, hits[0])
+            if not frontier_size:
+                break
+            level += 1
+    finally:
+        # a worker waiting on a failed one never reads its STOP
+        for control in controls:
+            control.put((STOP,))
+        for worker in workers:
+            worker.join(STOP_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+
+    print('No connection to Kevin Bacon')
+    sys.exit(0)
+
+
+def main():
+    """ main function to execute to run agent """
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 kb_sharded.py <twitter_user> [workers]")
+
+    start = time.time()
+
+    # prints resutls of search
+    shards = int(sys.argv[2]) if len(sys.argv) == 3 else SHARDS
+    try:
+        path_to_kevin_bacon = search_for_kevin_bacon(sys.argv[1], shards)
+    except RuntimeError as error:
+        sys.exit("Search Failed Exception\n%s" % error)
+    for tweet in path_to_kevin_bacon:
+        user, tweet_id, tweet_text = tweet
+        print("%s, %d, %s" % (user, tweet_id, tweet_text))
+
+    print("--- %s seconds ---" % (time.time() - start))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module stores crawled Twitter data as a compact, memory-mappable mention
+graph snapshot. A snapshot is a directory of flat arrays, so a multi-gigabyte
+crawl can be opened instantly and its pages shared by several processes:
+
+    meta.json          format version and sizes
+    names.npy          sorted, interned screen names (user id = position)
+    fetched.npy        whether the timeline of each user was crawled
+    offsets.npy        CSR row offsets into targets.npy for each user
+    targets.npy        user ids mentioned by each user
+    edge_tweets.npy    tweet index of the first mention of each target
+    bacon_tweets.npy   tweet index of each user's Kevin Bacon tweet, or -1
+    tweet_ids.npy      id of each stored tweet
+    text_offsets.npy   offsets of each stored tweet text in texts.bin
+    texts.bin          UTF-8 encoded tweet texts
+
+Snapshots are built from cached search_twitter() responses, stored one JSON
+file per user as <screen_name>.json. The cache can be written from the user
+searches of a recorded trace, see search_trace.py.
+"""
+
+import io
+import os
+import sys
+import json
+import numpy as np
+from records import Edge
+from bacon_pattern import BACON_PATTERN
+from search_trace import read_trace
+
+
+FORMAT_VERSION = 1
+TWEET_TEXT = 'full_text'
+CACHE_EXTENSION = '.json'
+USER_QUERY = 'from:'
+NO_TWEET = -1
+
+ARRAYS = ('names', 'fetched', 'offsets', 'targets', 'edge_tweets',
+          'bacon_tweets', 'tweet_ids', 'text_offsets')
+TEXTS = 'texts.bin'
+META = 'meta.json'
+
+
+def iter_cached_responses(directory):
+    """
+    Reads cached search_twitter() responses from a directory.
+
+    Args:
+        directory: directory containing one <screen_name>.json file per user
+
+    Returns:
+        A generator of (screen name, response) pairs
+    """
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(CACHE_EXTENSION):
+            continue
+        with io.open(os.path.join(directory, file_name), encoding='utf-8') \
+                as cache_file:
+            response = json.load(cache_file)
+        yield file_name[:-len(CACHE_EXTENSION)], response
+
+
+def iter_trace_responses(path):
+    """
+    Reads the responses to the user searches of a trace. A search with a
+    since_id adds its newer tweets to the earlier response for the user.
+
+    Args:
+        path: the trace file to read
+
+    Returns:
+        A list of (screen name, response) pairs, in the order the users were
+        first searched
+    """
+    _, calls = read_trace(path)
+    responses = {}
+    for call in calls:
+        query = call['query']
+        if not query.startswith(USER_QUERY) or call.get('max_id'):
+            continue
+        try:
+            statuses = call['results']['statuses']
+        except (TypeError, KeyError):
+            continue
+
+        user = query[len(USER_QUERY):]
+        if call['since_id'] is None:
+            responses[user] = {'statuses': list(statuses)}
+        elif user in responses:
+            responses[user]['statuses'][:0] = statuses
+    return list(responses.items())
+
+
+def write_cache(directory, responses):
+    """
+    Writes search_twitter() responses as cache files that a snapshot can be
+    built from.
+
+    Args:
+        directory: directory to write one <screen_name>.json file per user to
+        responses: iterable of (screen name, response) pairs
+
+    Returns:
+        The number of files written
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    written = 0
+    for user, response in responses:
+        with io.open(os.path.join(directory, user + CACHE_EXTENSION), 'w',
+                     encoding='utf-8') as cache_file:
+            cache_file.write(json.dumps(response, ensure_ascii=False))
+        written += 1
+    return written
+
+
+def write_snapshot(path, responses):
+    """
+    Builds a mention graph snapshot from search_twitter() responses. Only
+    tweets that mention a new user or contain Kevin Bacon are stored, and
+    each (user, mentioned user) edge keeps the first tweet it was made in.
+
+    Args:
+        path: directory to write the snapshot to
+        responses: iterable of (screen name, response) pairs
+
+    Returns:
+        The number of users in the snapshot
+    """
+    ids = {}
+    names = []
+    rows = {}
+    bacon = {}
+    tweet_ids = []
+    texts = []
+
+    def intern(name):
+        """ returns the id of a screen name, assigning one if it is new """
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    def store(tweet):
+        """ stores a tweet and returns its index """
+        tweet_ids.append(tweet['id'])
+        texts.append(tweet[TWEET_TEXT].encode('utf-8'))
+        return len(tweet_ids) - 1
+
+    for user, response in responses:
+        user_id = intern(user)
+        try:
+            statuses = response['statuses']
+        except (TypeError, KeyError):
+            continue
+
+        # only a user whose timeline was returned counts as fetched
+        row = rows.setdefault(user_id, [])
+        targets = set(target for target, _ in row)
+
+        for tweet in statuses:
+            tweet_index = None
+            if user_id not in bacon and \
+                    BACON_PATTERN.search(tweet[TWEET_TEXT]):
+                tweet_index = store(tweet)
+                bacon[user_id] = tweet_index
+
+            for mention in tweet['entities']['user_mentions']:
+                target = intern(mention['screen_name'])
+                if target in targets:
+                    continue
+                if tweet_index is None:
+                    tweet_index = store(tweet)
+                targets.add(target)
+                row.append((target, tweet_index))
+
+    # renumber users so the names table is sorted and searchable
+    order = sorted(range(len(names)), key=lambda user_id: names[user_id])
+    renumber = np.empty(len(names), dtype=np.int64)
+    renumber[order] = np.arange(len(names), dtype=np.int64)
+    encoded = [names[user_id].encode('utf-8') for user_id in order]
+    width = max([len(name) for name in encoded] + [1])
+
+    fetched = np.zeros(len(names), dtype=bool)
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    bacon_tweets = np.full(len(names), NO_TWEET, dtype=np.int64)
+    targets = []
+    edge_tweets = []
+    for new_id, user_id in enumerate(order):
+        row = rows.get(user_id)
+        if row is not None:
+            fetched[new_id] = True
+            targets.extend(target for target, _ in row)
+            edge_tweets.extend(tweet_index for _, tweet_index in row)
+        offsets[new_id + 1] = len(targets)
+        bacon_tweets[new_id] = bacon.get(user_id, NO_TWEET)
+
+    text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+
+    arrays = {
+        'names': np.array(encoded, dtype='S%d' % width),
+        'fetched': fetched,
+        'offsets': offsets,
+        'targets': renumber[np.array(targets, dtype=np.int64)],
+        'edge_tweets': np.array(edge_tweets, dtype=np.int64),
+        'bacon_tweets': bacon_tweets,
+        'tweet_ids': np.array(tweet_ids, dtype=np.int64),
+        'text_offsets': text_offsets,
+    }
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for name in ARRAYS:
+        np.save(os.path.join(path, name + '.npy'), arrays[name])
+    with open(os.path.join(path, TEXTS), 'wb') as texts_file:
+        for text in texts:
+            texts_file.write(text)
+    with open(os.path.join(path, META), 'w') as meta_file:
+        json.dump({'version': FORMAT_VERSION, 'users': len(names),
+                   'edges': len(targets), 'tweets': len(texts)}, meta_file)
+    return len(names)
+
+
+def __load_array__(path, name):
+    """
+    Maps one array of a snapshot.
+
+    Args:
+        path: directory of the snapshot
+        name: name of the array, one of ARRAYS
+
+    Returns:
+        The read-only memory-mapped array
+    """
+    return np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+
+class MentionGraph(object):
+    """
+    Read-only, memory-mapped view of a mention graph snapshot. Arrays are
+    mapped rather than read, so opening a snapshot costs the same for any
+    size and the pages are shared between processes mapping the same files.
+
+    Attribute(s):
+        names (ndarray): sorted screen names, encoded as UTF-8
+        fetched (ndarray): whether the timeline of each user was crawled
+        offsets (ndarray): CSR row offsets of each user
+        targets (ndarray): mentioned user ids
+        edge_tweets (ndarray): tweet index of each mention edge
+        bacon_tweets (ndarray): Kevin Bacon tweet index of each user, or -1
+        tweet_ids (ndarray): id of each stored tweet
+        text_offsets (ndarray): offsets of each tweet text in texts
+        texts (memmap): UTF-8 encoded tweet texts
+    """
+    def __init__(self, path):
+        with open(os.path.join(path, META)) as meta_file:
+            meta = json.load(meta_file)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError("unsupported snapshot version %s"
+                             % meta['version'])
+
+        self.names = __load_array__(path, 'names')
+        self.fetched = __load_array__(path, 'fetched')
+        self.offsets = __load_array__(path, 'offsets')
+        self.targets = __load_array__(path, 'targets')
+        self.edge_tweets = __load_array__(path, 'edge_tweets')
+        self.bacon_tweets = __load_array__(path, 'bacon_tweets')
+        self.tweet_ids = __load_array__(path, 'tweet_ids')
+        self.text_offsets = __load_array__(path, 'text_offsets')
+        if self.text_offsets[-1]:
+            self.texts = np.memmap(os.path.join(path, TEXTS), dtype=np.uint8,
+                                   mode='r')
+        else:
+            self.texts = np.zeros(0, dtype=np.uint8)
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def user_id(self, name):
+        """
+        Looks up the id of a screen name with a binary search.
+
+        Args:
+            name: screen name to look up
+
+        Returns:
+            The user id, or None if the name is not in the snapshot
+        """
+        encoded = name.encode('utf-8')
+        position = int(np.searchsorted(self.names, encoded))
+        if position < len(self.names) and self.names[position] == encoded:
+            return position
+        return None
+
+
+    def name(self, user_id):
+        """(str) Returns the screen name of a user id."""
+        return self.names[user_id].decode('utf-8')
+
+
+    def mentions(self, user_id):
+        """
+        Returns the users mentioned by a user and the tweets mentioning them.
+
+        Args:
+            user_id: id of the user
+
+        Returns:
+            Arrays of mentioned user ids and their tweet indices
+        """
+        start, end = self.offsets[user_id], self.offsets[user_id + 1]
+        return self.targets[start:end], self.edge_tweets[start:end]
+
+
+    def tweet(self, tweet_index):
+        """
+        Returns a stored tweet.
+
+        Args:
+            tweet_index: index of the tweet
+
+        Returns:
+            The tweet id and tweet text
+        """
+        start = self.text_offsets[tweet_index]
+        end = self.text_offsets[tweet_index + 1]
+        return (int(self.tweet_ids[tweet_index]),
+                self.texts[start:end].tobytes().decode('utf-8'))
+
+
+def find_kevin_bacon(graph, start):
+    """
+    Runs a level-synchronous breadth-first search over a snapshot without
+    making any Twitter calls. Each level gathers the CSR rows of the whole
+    frontier with array operations.
+
+    Args:
+        graph: an open MentionGraph
+        start: a twitter user to start searching for Kevin Bacon from
+
+    Returns:
+        The path to get to Kevin Bacon, or None if none is found
+    """
+    start_id = graph.user_id(start)
+    if start_id is None:
+        return None
+
+    visited = np.zeros(len(graph), dtype=bool)
+    predecessor = np.full(len(graph), NO_TWEET, dtype=np.int64)
+    via_tweet = np.full(len(graph), NO_TWEET, dtype=np.int64)
+    frontier = np.array([start_id], dtype=np.int64)
+    visited[frontier] = True
+
+    while len(frontier):
+        hits = frontier[graph.bacon_tweets[frontier] != NO_TWEET]
+        if len(hits):
+            user_id = hits[0]
+            path_to_kevin_bacon = [
+                Edge(graph.name(user_id),
+                     *graph.tweet(graph.bacon_tweets[user_id]))]
+            while predecessor[user_id] != NO_TWEET:
+                path_to_kevin_bacon.append(
+                    Edge(graph.name(predecessor[user_id]),
+                         *graph.tweet(via_tweet[user_id])))
+                user_id = predecessor[user_id]
+            path_to_kevin_bacon.reverse()
+            return path_to_kevin_bacon
+
+        # gather the CSR rows of every user in the frontier
+        starts = graph.offsets[frontier]
+        counts = graph.offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            break
+        row_starts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        edges = row_starts + np.arange(total, dtype=np.int64)
+        sources = np.repeat(frontier, counts)
+        targets = graph.targets[edges]
+
+        # keep the first mention of each unvisited user
+        unvisited = ~visited[targets]
+        edges, sources, targets = \
+            edges[unvisited], sources[unvisited], targets[unvisited]
+        _, first = np.unique(targets, return_index=True)
+        first.sort()
+        frontier = targets[first]
+
+        visited[frontier] = True
+        predecessor[frontier] = sources[first]
+        via_tweet[frontier] = graph.edge_tweets[edges[first]]
+
+    return None
+
+
+def main():
+    """ main function to write a cache, or build or search a snapshot """
+    if len(sys.argv) != 4 or sys.argv[1] not in ('cache', 'build', 'search'):
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 mention_graph.py cache <trace> " + \
+                 "<cache_dir>\n" + \
+                 "       python3 mention_graph.py build <cache_dir> " + \
+                 "<snapshot_dir>\n" + \
+                 "       python3 mention_graph.py search <snapshot_dir> " + \
+                 "<twitter_user>")
+
+    if sys.argv[1] == 'cache':
+        files = write_cache(sys.argv[3], iter_trace_responses(sys.argv[2]))
+        print("%d users written to %s" % (files, sys.argv[3]))
+        return
+
+    if sys.argv[1] == 'build':
+        users = write_snapshot(sys.argv[3], iter_cached_responses(sys.argv[2]))
+        print("%d users written to %s" % (users, sys.argv[3]))
+        return
+
+    path_to_kevin_bacon = find_kevin_bacon(MentionGraph(sys.argv[2]),
+                                           sys.argv[3])
+    if path_to_kevin_bacon is None:
+        print('No connection to Kevin Bacon')
+        return
+    for tweet in path_to_kevin_bacon:
+        user, tweet_id, tweet_text = tweet
+        print("%s, %d, %s" % (user, tweet_id, tweet_text))
+
+if __name__ == '__main__':
+    main()
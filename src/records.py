@@ -0,0 +1,37 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module defines the records the agents create for every mention they
+expand. They are named tuples, so they have no per-instance dictionary, and
+they still unpack and compare like the plain tuples they replace.
+"""
+
+from typing import NamedTuple
+
+
+class Edge(NamedTuple):
+    """
+    A tweet on a path to Kevin Bacon, made by a user and mentioning the next
+    user on the path.
+
+    Attribute(s):
+        user (str): screen name of the tweeter
+        tweet_id (int): id of the tweet
+        text (str): text of the tweet
+    """
+    user: str
+    tweet_id: int
+    text: str
+
+
+class FrontierEntry(NamedTuple):
+    """
+    A user waiting to be searched by a depth limited search.
+
+    Attribute(s):
+        user (str): screen name of the user
+        depth (int): number of tweets between the start user and this user
+    """
+    user: str
+    depth: int
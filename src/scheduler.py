@@ -0,0 +1,366 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module shares one pool of Twitter accounts between many concurrent
+searches. Search calls are submitted on behalf of a tenant and made by a fixed
+set of dispatcher threads, each holding one account of the pool. Tenants take
+turns by weighted fair queuing, so a deep crawl with many queued calls cannot
+hold up a short lookup, and the calls of one tenant are made in priority
+order. A tenant can be held to a quota of calls per rate limit window, and the
+calls, queueing time and throttling of every tenant are counted.
+"""
+
+import time
+import heapq
+import itertools
+import threading
+from threaded_twitter_wrapper import TwitterConnection, ACCOUNTS, MINUTE, \
+        RATE_LIMITE_TIMER
+
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+PRIORITIES = {'high': HIGH, 'normal': NORMAL, 'low': LOW}
+
+DEFAULT_TENANT = 'default'
+
+# seconds a tenant quota applies to, one rate limit window
+QUOTA_WINDOW = RATE_LIMITE_TIMER * MINUTE
+
+
+class Tenant(object):
+    """
+    Data class that stores a user of the account pool and its queued calls.
+
+    Attribute(s):
+        name: name of the tenant
+        weight: share of the calls relative to the other tenants
+        quota: calls allowed per quota window, None for no limit
+        queue: heap of (priority, order, call) of the waiting calls
+        finish: virtual time the tenant's last turn finished
+        window_start: time the current quota window started
+        window_calls: calls made in the current quota window
+        calls: calls made
+        waited: seconds the made calls spent queued
+        throttled: calls held back by the quota
+        failed: calls that raised an exception
+    """
+    def __init__(self, name, weight=1.0, quota=None):
+        self.name = name
+        self.weight = weight
+        self.quota = quota
+        self.queue = []
+        self.finish = 0.0
+        self.window_start = 0.0
+        self.window_calls = 0
+        self.calls = 0
+        self.waited = 0.0
+        self.throttled = 0
+        self.failed = 0
+
+
+class ScheduledCall(object):
+    """
+    Data class that stores a search call waiting for a dispatcher.
+
+    Attribute(s):
+        tenant: the Tenant making the call
+        query: the query made to Twitter
+        since_id: only return tweets newer than this tweet id
+        max_id: only return tweets up to this tweet id
+        submitted: time the call was submitted
+        throttled: whether the call was held back by a quota
+        done: event set once the call is made
+        results: the results of the call
+    """
+    def __init__(self, tenant, query, since_id=None, max_id=None):
+        self.tenant = tenant
+        self.query = query
+        self.since_id = since_id
+        self.max_id = max_id
+        self.submitted = time.time()
+        self.throttled = False
+        self.done = threading.Event()
+        self.results = []
+
+
+def pooled_connections(twitter, workers=None):
+    """
+    Creates connections that take turns using the accounts of a connection's
+    pool and record to its trace.
+
+    Args:
+        twitter: the TwitterConnection owning the account pool
+        workers: number of connections, defaults to one per account
+
+    Returns:
+        A list of connections starting with the given one
+    """
+    workers = workers or max(1, len(ACCOUNTS))
+    connections = [twitter]
+    for _ in range(workers - 1):
+        connection = TwitterConnection(trim=twitter.trim, trace_path=None,
+                                       pool=twitter.active_accounts)
+        connection.trace = twitter.trace
+        connections.append(connection)
+    return connections
+
+
+class FairScheduler(object):
+    """
+    Multiplexes the search calls of many tenants over a set of connections.
+    Each connection is driven by its own dispatcher thread, which takes the
+    next call of the tenant with the earliest virtual start time among the
+    tenants with queued calls and quota left. A turn advances a tenant's
+    virtual time by 1 / weight, and a tenant that was idle starts from the
+    current virtual time, so it cannot save up turns.
+
+    Attribute(s):
+        connections (list): connections used by the dispatchers
+        quota_window (float): seconds a tenant quota applies to
+        tenants (dict): Tenant of each tenant name
+        virtual_time (float): virtual start time of the last turn
+        running (bool): whether calls are still accepted
+    """
+    def __init__(self, connections, quota_window=QUOTA_WINDOW):
+        self.connections = connections
+        self.quota_window = quota_window
+        self.tenants = {}
+        self.virtual_time = 0.0
+        self.running = True
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+
+        self.dispatchers = []
+        for connection in connections:
+            dispatcher = threading.Thread(target=self.__dispatch__,
+                                          args=(connection,))
+            dispatcher.daemon = True
+            dispatcher.start()
+            self.dispatchers.append(dispatcher)
+
+
+    def __tenant__(self, name):
+        """
+        Returns the Tenant of a name, adding it with the default weight and no
+        quota if it is new. The lock must be held.
+
+        Args:
+            name: name of the tenant
+        """
+        tenant = self.tenants.get(name)
+        if tenant is None:
+            tenant = self.tenants[name] = Tenant(name)
+        return tenant
+
+
+    def tenant(self, name, weight=1.0, quota=None):
+        """
+        Adds a tenant or changes its weight and quota.
+
+        Args:
+            name: name of the tenant
+            weight: share of the calls relative to the other tenants, must be
+                    positive
+            quota: calls allowed per quota window, None for no limit
+        """
+        if weight <= 0:
+            raise ValueError("tenant %s weight must be positive, not %s"
+                             % (name, weight))
+        if quota is not None and quota < 1:
+            raise ValueError("tenant %s quota must be at least 1, not %s"
+                             % (name, quota))
+        with self.lock:
+            tenant = self.__tenant__(name)
+            tenant.weight = weight
+            tenant.quota = quota
+            self.ready.notify_all()
+
+
+    def submit(self, name, query, since_id=None, max_id=None,
+               priority=NORMAL):
+        """
+        Queues a search call for a tenant and waits until it is made.
+
+        Args:
+            name: name of the tenant making the call
+            query: the query made to Twitter
+            since_id: only return tweets newer than this tweet id
+            max_id: only return tweets up to this tweet id
+            priority: HIGH, NORMAL or LOW, calls of a tenant are made in
+                      priority order
+
+        Returns:
+            The results of the search call, or an empty list if the
+            scheduler was shut down first
+        """
+        with self.lock:
+            if not self.running:
+                return []
+            tenant = self.__tenant__(name)
+            call = ScheduledCall(tenant, query, since_id, max_id)
+            if not tenant.queue:
+                tenant.finish = max(tenant.finish, self.virtual_time)
+            heapq.heappush(tenant.queue, (priority, next(self.order), call))
+            self.ready.notify()
+        call.done.wait()
+        return call.results
+
+
+    def connection(self, name, priority=NORMAL):
+        """
+        Returns a stand-in for a TwitterConnection whose searches are made
+        through the scheduler, so an agent can run as a tenant.
+
+        Args:
+            name: name of the tenant
+            priority: priority of the agent's calls
+        """
+        return TenantConnection(self, name, priority)
+
+
+    def __next_call__(self):
+        """
+        Takes the next call to make. The lock must be held.
+
+        Returns:
+            The next call, or None, and the seconds until a throttled tenant
+            gets a new quota window, or None if no tenant is throttled
+        """
+        now = time.time()
+        chosen = None
+        timeout = None
+        for tenant in self.tenants.values():
+            if not tenant.queue:
+                continue
+            if now - tenant.window_start >= self.quota_window:
+                tenant.window_start = now
+                tenant.window_calls = 0
+            if tenant.quota is not None and \
+                    tenant.window_calls >= tenant.quota:
+                head = tenant.queue[0][2]
+                if not head.throttled:
+                    head.throttled = True
+                    tenant.throttled += 1
+                reset = tenant.window_start + self.quota_window - now
+                timeout = reset if timeout is None else min(timeout, reset)
+                continue
+            if chosen is None or tenant.finish < chosen.finish:
+                chosen = tenant
+
+        if chosen is None:
+            return None, timeout
+
+        _, _, call = heapq.heappop(chosen.queue)
+        self.virtual_time = chosen.finish
+        chosen.finish += 1.0 / chosen.weight
+        chosen.window_calls += 1
+        chosen.calls += 1
+        chosen.waited += now - call.submitted
+        return call, timeout
+
+
+    def __dispatch__(self, connection):
+        """
+        Makes queued calls with a connection until the scheduler shuts down.
+        A call that raises returns no results and is counted as failed, so
+        the dispatcher keeps its account serving the other calls.
+
+        Args:
+            connection: the TwitterConnection to search with
+        """
+        while True:
+            with self.lock:
+                call, timeout = self.__next_call__()
+                while call is None and self.running:
+                    self.ready.wait(timeout)
+                    call, timeout = self.__next_call__()
+            if call is None:
+                break
+
+            try:
+                if connection.connection is None:
+                    connection.connect_to_twitter()
+                call.results = connection.search_twitter(
+                    call.query, since_id=call.since_id, max_id=call.max_id)
+            except Exception:
+                with self.lock:
+                    call.tenant.failed += 1
+            finally:
+                call.done.set()
+
+        connection.disconnect()
+
+
+    def shutdown(self):
+        """
+        Stops accepting calls, fails the queued ones and returns every
+        dispatcher's account to the pool once its current call is made.
+        """
+        with self.lock:
+            self.running = False
+            for tenant in self.tenants.values():
+                for _, _, call in tenant.queue:
+                    call.done.set()
+                tenant.queue = []
+            self.ready.notify_all()
+        for dispatcher in self.dispatchers:
+            dispatcher.join()
+
+
+    def stats(self):
+        """
+        Returns the calls, queued calls, throttled calls, failed calls and
+        average queueing time of every tenant.
+        """
+        with self.lock:
+            return dict((tenant.name, {
+                'weight': tenant.weight,
+                'quota': tenant.quota,
+                'calls': tenant.calls,
+                'queued': len(tenant.queue),
+                'throttled': tenant.throttled,
+                'failed': tenant.failed,
+                'average_wait': tenant.waited / tenant.calls
+                                if tenant.calls else 0.0,
+            }) for tenant in self.tenants.values())
+
+
+class TenantConnection(object):
+    """
+    Stands in for a TwitterConnection and makes its searches through a
+    FairScheduler on behalf of a tenant.
+
+    Attribute(s):
+        scheduler (FairScheduler): the scheduler making the calls
+        name (str): name of the tenant
+        priority (int): priority of the calls
+    """
+    def __init__(self, scheduler, name, priority=NORMAL):
+        self.scheduler = scheduler
+        self.name = name
+        self.priority = priority
+
+
+    def connect_to_twitter(self):
+        """ the scheduler's dispatchers hold the connections """
+        pass
+
+
+    def search_twitter(self, query, since_id=None, max_id=None):
+        """
+        Makes a search call through the scheduler.
+
+        Args:
+            query: the query made to Twitter
+            since_id: only return tweets newer than this tweet id
+            max_id: only return tweets up to this tweet id
+
+        Returns:
+            The results of the search call
+        """
+        return self.scheduler.submit(self.name, query, since_id=since_id,
+                                     max_id=max_id, priority=self.priority)
@@ -0,0 +1,267 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module records searches made to Twitter and replays them. A trace is a
+gzip compressed file of JSON lines, one for every search call, holding the
+query, when the call started, how long it took, how many rate limit errors
+it ran into and the trimmed results. Replaying a trace runs any agent against
+the recorded results, either as fast as possible or with the recorded timing,
+so slow searches can be reproduced and profiled later.
+
+A trace also records the seed of the mention sampling in fanout.py, and a
+replay starts from an index of users who tweeted Kevin Bacon built only from
+the recorded index searches, so replaying a trace takes the same path every
+time, wherever it is run.
+"""
+
+import sys
+import gzip
+import json
+import time
+import zlib
+import atexit
+import random
+import threading
+import importlib
+from collections import deque, defaultdict
+import fanout
+from bacon_index import BaconIndex, SEED_QUERY
+
+
+FORMAT_VERSION = 1
+
+
+class TraceWriter(object):
+    """
+    Appends search calls to a trace file. Every call is flushed so a trace
+    stays readable if the search is interrupted. A writer can be shared by
+    connections searching from several threads. The mention sampling is
+    seeded with a new seed, which is recorded in the header.
+
+    Attribute(s):
+        trace_file (GzipFile): the open trace file
+        started (float): time the recording started
+        seed (int): seed of the mention sampling
+        lock (Lock): serializes writes
+    """
+    def __init__(self, path, seed=None):
+        self.lock = threading.Lock()
+        self.trace_file = gzip.open(path, 'wb')
+        self.started = time.time()
+        self.seed = random.getrandbits(32) if seed is None else seed
+        fanout.RANDOM.seed(self.seed)
+        self.__write__({'version': FORMAT_VERSION, 'started': self.started,
+                        'seed': self.seed})
+        atexit.register(self.close)
+
+
+    def __write__(self, line):
+        """
+        Writes a line of the trace.
+
+        Args:
+            line: object to encode as JSON
+        """
+        with self.lock:
+            if self.trace_file.closed:
+                return
+            self.trace_file.write(json.dumps(line).encode('utf-8') + b'\n')
+            self.trace_file.flush()
+
+
+    def record(self, query, since_id, max_id, started, seconds, rate_limits,
+               results):
+        """
+        Records a search call.
+
+        Args:
+            query: the query made to Twitter
+            since_id: the since_id of the call, or None
+            max_id: the max_id of the call, or None
+            started: time the call started
+            seconds: duration of the call, including rate limit waits
+            rate_limits: rate limit errors the call ran into
+            results: the results of the call
+        """
+        self.__write__({'query': query, 'since_id': since_id,
+                        'max_id': max_id,
+                        'offset': started - self.started, 'seconds': seconds,
+                        'rate_limits': rate_limits, 'results': results})
+
+
+    def close(self):
+        """ closes the trace file """
+        with self.lock:
+            if not self.trace_file.closed:
+                self.trace_file.close()
+
+
+def read_trace(path):
+    """
+    Reads the header and search calls of a trace. A trace cut off by an
+    interrupted search, or corrupted after some calls, is read up to its last
+    complete call.
+
+    Args:
+        path: the trace file to read
+
+    Returns:
+        The header of the trace and a list of the recorded calls
+    """
+    header = {}
+    calls = []
+    with gzip.open(path, 'rb') as trace_file:
+        try:
+            for line in trace_file:
+                try:
+                    call = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    break
+                if 'version' in call:
+                    if call['version'] != FORMAT_VERSION:
+                        raise ValueError("unsupported trace version %s"
+                                         % call['version'])
+                    header = call
+                    continue
+                calls.append(call)
+        except (IOError, EOFError, zlib.error):
+            pass
+    return header, calls
+
+
+class ReplayConnection(object):
+    """
+    Stands in for a TwitterConnection and answers searches from a trace.
+    Repeated queries are answered in the order they were recorded, and
+    queries missing from the trace fail like a failed Twitter call.
+
+    Attribute(s):
+        realtime (bool): whether each call takes as long as it was recorded
+        seed (int): seed of the recorded mention sampling, 0 for a trace
+                    recorded without one
+        responses (dict): recorded calls of each (query, since_id, max_id)
+        calls (int): searches answered
+        missing (int): searches not found in the trace
+        rate_limits (int): rate limit errors of the replayed calls
+    """
+    def __init__(self, path, realtime=False):
+        self.realtime = realtime
+        self.responses = defaultdict(deque)
+        self.calls = 0
+        self.missing = 0
+        self.rate_limits = 0
+        header, calls = read_trace(path)
+        self.seed = header.get('seed') or 0
+        for call in calls:
+            key = (call['query'], call['since_id'], call.get('max_id'))
+            self.responses[key].append(call)
+
+
+    def connect_to_twitter(self):
+        """ nothing to connect to while replaying """
+        pass
+
+
+    def search_twitter(self, query, since_id=None, max_id=None):
+        """
+        Answers a search with its recorded results.
+
+        Args:
+            query: the query made to Twitter
+            since_id: only return tweets newer than this tweet id
+            max_id: only return tweets up to this tweet id
+
+        Returns:
+            The recorded results of the search, or an empty list if the
+            search was not recorded
+        """
+        self.calls += 1
+        recorded = self.responses.get((query, since_id, max_id))
+        if not recorded:
+            self.missing += 1
+            return []
+        call = recorded.popleft()
+        self.rate_limits += call['rate_limits']
+        if self.realtime:
+            time.sleep(call['seconds'])
+        return call['results']
+
+
+    def bacon_index(self):
+        """
+        Builds an index of users who tweeted Kevin Bacon from the recorded
+        index searches only, without answering them.
+
+        Returns:
+            A BaconIndex that is not saved to a file
+        """
+        index = BaconIndex(None)
+        for (query, _, _), recorded in self.responses.items():
+            if query != SEED_QUERY:
+                continue
+            for call in recorded:
+                try:
+                    index.add_statuses(call['results']['statuses'])
+                except (TypeError, KeyError):
+                    pass
+        return index
+
+
+def replay_agent(agent_name, connection):
+    """
+    Imports an agent and points it at a replayed trace. The agent searches
+    through the connection, with the index and sampling seed of the trace.
+    Only modules whose search_for_kevin_bacon fetches through their own
+    TWITTER can be replayed, so kb_planner and kb_server, which search
+    through kb_bfs_level, and kb_sharded are rejected.
+
+    Args:
+        agent_name: module name of the agent, such as kb_bfs
+        connection: the ReplayConnection to search with
+
+    Returns:
+        The agent module
+    """
+    agent = importlib.import_module(agent_name)
+    if not hasattr(agent, 'TWITTER') or \
+            not hasattr(agent, 'search_for_kevin_bacon'):
+        raise ValueError("agent %s does not search for Kevin Bacon through "
+                         "its own TWITTER, so it cannot replay a trace"
+                         % agent_name)
+    agent.TWITTER = connection
+    if hasattr(agent, 'BACON_INDEX'):
+        agent.BACON_INDEX = connection.bacon_index()
+    fanout.RANDOM.seed(connection.seed)
+    return agent
+
+
+def main():
+    """ main function to replay a trace against an agent """
+    arguments = [argument for argument in sys.argv[1:]
+                 if argument != '--realtime']
+    if len(arguments) != 3:
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 search_trace.py [--realtime] <trace> " + \
+                 "<agent_module> <twitter_user>")
+
+    trace_path, agent_name, user = arguments
+    connection = ReplayConnection(trace_path, '--realtime' in sys.argv)
+    try:
+        agent = replay_agent(agent_name, connection)
+    except ValueError as error:
+        sys.exit("Invalid Agent Exception\n%s" % error)
+
+    start = time.time()
+    try:
+        # prints resutls of search
+        for tweet in agent.search_for_kevin_bacon(user):
+            user, tweet_id, tweet_text = tweet
+            print("%s, %d, %s" % (user, tweet_id, tweet_text))
+    finally:
+        print("--- %s seconds, %d calls, %d missing, %d rate limits ---" %
+              (time.time() - start, connection.calls, connection.missing,
+               connection.rate_limits))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module writes a synthetic trace, see search_trace.py, for benchmarking
+the agents without a recorded search. Every user u0 to u<users - 1> has a
+page of tweets mentioning zero to two random users, and one user past the
+start has a tweet about Kevin Bacon. The same seed always writes the same
+trace under the same Python version, so write the trace once and replay that
+file against every tree being compared.
+"""
+
+import sys
+import random
+from search_trace import TraceWriter
+
+
+# users in the trace
+USERS = 4000
+
+# tweets on the page of each user
+TWEETS = 20
+
+# seed of the generated graph
+SEED = 7
+
+# mentions made by a tweet, picked uniformly
+MENTIONS = (0, 1, 1, 2)
+
+
+def write_trace(path, users=USERS, tweets=TWEETS, seed=SEED):
+    """
+    Writes a trace with one search call for the page of every user.
+
+    Args:
+        path: the trace file to write
+        users: number of users
+        tweets: number of tweets on each page
+        seed: seed of the generated graph
+
+    Returns:
+        The screen name of the user who tweeted Kevin Bacon
+    """
+    rng = random.Random(seed)
+    trace = TraceWriter(path)
+    bacon_user = 'u%d' % rng.randrange(users // 4, users)
+    tweet_id = 1
+    for user_id in range(users):
+        user = 'u%d' % user_id
+        statuses = []
+        for tweet in range(tweets):
+            mentions = ['u%d' % rng.randrange(users)
+                        for _ in range(rng.choice(MENTIONS))]
+            text = 'tweet %d ' % tweet + \
+                   ' '.join('@' + mention for mention in mentions)
+            if user == bacon_user and tweet == tweets - 1:
+                text = 'I love Kevin Bacon'
+            statuses.append({
+                'id': tweet_id,
+                'full_text': text,
+                'retweet_count': rng.randrange(5),
+                'favorite_count': rng.randrange(5),
+                'user': {'screen_name': user},
+                'entities': {'user_mentions': [{'screen_name': mention}
+                                               for mention in mentions]},
+            })
+            tweet_id += 1
+        trace.record('from:%s' % user, None, None, trace.started, 0.0, 0,
+                     {'statuses': statuses})
+    trace.close()
+    return bacon_user
+
+
+def main():
+    """ main function to write a synthetic trace """
+    if len(sys.argv) not in (2, 3, 4):
+        sys.exit("Invalid Argument Exception\n" + \
+                 "Usage: python3 synthetic_trace.py <trace> [users] [seed]")
+
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else USERS
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else SEED
+    bacon_user = write_trace(sys.argv[1], users, seed=seed)
+    print("%d users, %s tweeted Kevin Bacon, start from u0" %
+          (users, bacon_user))
+
+if __name__ == '__main__':
+    main()
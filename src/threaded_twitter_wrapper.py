@@ -6,11 +6,18 @@ This module acts as a wrapper for the Twython module. It allows the user to
 exceed the standard rate limit of the search call to the Twitter API by
 rotating accounts when a specified account exceeds it's limit. If all accounts
 timeout, it sleeps an application for 10 minutes before resuming.
+
+Every search can be recorded to a trace file, see search_trace.py, by setting
+the KB_TRACE environment variable to the path of the trace.
 """
 
+import os
+import time
 from time import sleep
 from multiprocessing import Process, Manager
 from twython import Twython, TwythonRateLimitError, TwythonError
+from tweet_store import trim_response
+from search_trace import TraceWriter
 
 
 # enter your keys, and tokens obtained from your twitter app
@@ -20,6 +27,9 @@ RATE_LIMITE_TIMER = 15
 # enter your keys, and tokens obtained from your twitter app
 ACCOUNTS = []
 
+# file every search is recorded to, or None to not record
+TRACE_PATH = os.environ.get('KB_TRACE')
+
 def __account_refresher__(active_accounts, current_account):
     """
     Function that sleeps the specific process that represents a specific
@@ -44,17 +54,38 @@ class TwitterConnection(object):
         connection (Twython): Twython object that exists as the current
                               connection
         manager (Manger): Manger object that stores and manages active and
-                          inactive accounts
+                          inactive accounts, None if the pool is shared
+        trim (bool): Represents whether results are trimmed to slim tweets
+        trace (TraceWriter): Records every search, or None
+        rate_limits (int): Number of rate limit errors received
+
+    Args:
+        accounts: credentials to rotate through, defaults to ACCOUNTS
+        trim: whether results are trimmed to slim tweets, defaults to True
+        trace_path: file to record every search to, defaults to TRACE_PATH
+        pool: active accounts of another connection to share, so several
+              connections can search at once without using the same account
     """
-    def __init__(self):
+    def __init__(self, accounts=None, trim=True, trace_path=TRACE_PATH,
+                 pool=None):
         self.connection = None
+        self.trim = trim
+        self.trace = None
+        self.rate_limits = 0
+        if trace_path:
+            self.start_recording(trace_path)
+
+        self.current_account = None
+        if pool is not None:
+            self.manager = None
+            self.active_accounts = pool
+            return
 
         # handles processes linked to each account
         self.manager = Manager()
-        self.current_account = None
         self.active_accounts = self.manager.list()
 
-        for account in ACCOUNTS:
+        for account in ACCOUNTS if accounts is None else accounts:
             account_object = Account(*account)
             self.active_accounts.append(account_object)
 
@@ -62,39 +93,110 @@ class TwitterConnection(object):
     def connect_to_twitter(self):
         """
         Rotates which account is used to connect to the Twitter API. Then
-        establishes a connection to Twitter using twython.
-        """
-        if self.active_accounts:
-            self.current_account = self.active_accounts.pop()
-            key, secret, _, _ =\
-                    self.current_account.get_credentials()
-            oauth2_token =\
-                    Twython(key, secret, oauth_version=2).obtain_access_token()
-            self.connection = Twython(key, access_token=oauth2_token)
-        else:
+        establishes a connection to Twitter using twython. Accounts rejoin the
+        back of the pool once their rate limit resets, so the account taken
+        from the front is the one that has rested the longest.
+        """
+        try:
+            self.current_account = self.active_accounts.pop(0)
+        except IndexError:
+            # another connection may have taken the last account
             while len(self.active_accounts) < 1:
                 sleep(1)
             self.connect_to_twitter()
+            return
+
+        key, secret, _, _ =\
+                self.current_account.get_credentials()
+        oauth2_token =\
+                Twython(key, secret, oauth_version=2).obtain_access_token()
+        self.connection = Twython(key, access_token=oauth2_token)
+
+
+    def disconnect(self):
+        """
+        Returns the current account to the back of the pool.
+        """
+        if self.current_account is not None:
+            self.active_accounts.append(self.current_account)
+            self.current_account = None
+            self.connection = None
+
+
+    def start_recording(self, path):
+        """
+        Starts recording every search, its timing, its rate limit errors and
+        its results to a trace file.
+
+        Args:
+            path: the trace file to write
+        """
+        self.stop_recording()
+        self.trace = TraceWriter(path)
 
 
-    def search_twitter(self, query):
+    def stop_recording(self):
+        """
+        Stops recording and closes the trace file.
+        """
+        if self.trace:
+            self.trace.close()
+            self.trace = None
+
+
+    def search_twitter(self, query, since_id=None, max_id=None):
         """
         Makes a search call to Twitter based on a give query. If the rate limit
         is exceeded by the call, the current account is slept for 15 minutes
-        and a new connection is made.
+        and a new connection is made. The call is recorded if recording is on.
+
+        Args:
+            query: the query made to Twitter
+            since_id: only return tweets newer than this tweet id
+            max_id: only return tweets up to this tweet id
+
+        Returns:
+            The results of the search call made to Twitter, trimmed to slim
+            tweets unless trimming is turned off
+
+        """
+        started = time.time()
+        rate_limits = self.rate_limits
+        results = self.__search__(query, since_id, max_id)
+        if self.trace:
+            self.trace.record(query, since_id, max_id, started,
+                              time.time() - started,
+                              self.rate_limits - rate_limits, results)
+        return results
+
+
+    def __search__(self, query, since_id, max_id):
+        """
+        Makes the search call to Twitter, retrying with a new account while
+        the rate limit is exceeded.
 
         Args:
             query: the query made to Twitter
+            since_id: only return tweets newer than this tweet id
+            max_id: only return tweets up to this tweet id
 
         Returns:
             The results of the search call made to Twitter
 
         """
+        params = {'q': query, 'count': 100, 'tweet_mode': 'extended'}
+        if since_id:
+            params['since_id'] = since_id
+        if max_id:
+            params['max_id'] = max_id
+
         try:
             # Twitter search query
-            return self.connection.\
-                    search(q=query, count=100, tweet_mode='extended')
+            results = self.connection.search(**params)
+            return trim_response(results) if self.trim else results
         except TwythonRateLimitError:
+            self.rate_limits += 1
+
             # begin process of sleeping account
             account_sleep_process = \
                 Process(target=__account_refresher__,
@@ -104,7 +206,7 @@ class TwitterConnection(object):
 
             # make new connection and retry
             self.connect_to_twitter()
-            return self.search_twitter(query)
+            return self.__search__(query, since_id, max_id)
         except TwythonError:
             return []
 
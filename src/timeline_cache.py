@@ -0,0 +1,260 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module keeps the results of expensive lookups, such as Twitter timelines
+or Kevin Bacon paths, in memory for a long running process. Concurrent
+requests for the same key are coalesced, so only one of them does the lookup
+and the others wait for its result. Expired timelines are refreshed
+incrementally, asking Twitter only for tweets newer than the ones cached. A
+failed lookup is only kept for a short time, so a transient error does not
+hide a user for the whole time to live.
+"""
+
+import time
+import threading
+
+
+# number of tweets kept per timeline, the size of a single search page
+TIMELINE_LENGTH = 100
+
+
+class CoalescingCache(object):
+    """
+    Thread-safe cache of values that expire after a time to live. While a
+    value is being loaded, other requests for it wait for that load instead
+    of starting their own.
+
+    Attribute(s):
+        load (function): loads the value of a key
+        ttl (float): seconds a loaded value stays fresh
+        failed (function): returns whether a loaded value is a failure, or
+                           None if no value is
+        failed_ttl (float): seconds a failed value stays fresh
+        entries (dict): (load time, value, seconds fresh) of each key
+        in_flight (dict): event set when the pending load of a key completes
+        hits (int): requests answered from fresh entries
+        misses (int): requests that loaded their value
+        coalesced (int): requests that waited for another request's load
+        failures (int): loads that returned a failed value
+    """
+    def __init__(self, load, ttl, failed=None, failed_ttl=0):
+        self.load = load
+        self.ttl = ttl
+        self.failed = failed
+        self.failed_ttl = failed_ttl
+        self.entries = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failures = 0
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def get(self, key):
+        """
+        Returns the value of a key, loading it if it is missing or expired.
+
+        Args:
+            key: key to look up
+
+        Returns:
+            The value of the key
+        """
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and time.time() - entry[0] < entry[2]:
+                    self.hits += 1
+                    return entry[1]
+                pending = self.in_flight.get(key)
+                loading = pending is None
+                if loading:
+                    pending = self.in_flight[key] = threading.Event()
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+
+            if not loading:
+                # wait for the other request, and load again if it failed
+                pending.wait()
+                with self.lock:
+                    entry = self.entries.get(key)
+                if entry is not None:
+                    return entry[1]
+                continue
+
+            try:
+                value = self.__load__(key, entry)
+                ttl = self.ttl
+                with self.lock:
+                    if self.failed is not None and self.failed(value):
+                        ttl = self.failed_ttl
+                        self.failures += 1
+                    self.entries[key] = (time.time(), value, ttl)
+                return value
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+                pending.set()
+
+
+    def __load__(self, key, entry):
+        """
+        Loads the value of a key.
+
+        Args:
+            key: key to load
+            entry: the expired (load time, value, seconds fresh) of the key,
+                   or None
+
+        Returns:
+            The value of the key
+        """
+        return self.load(key)
+
+
+    def evict_expired(self):
+        """
+        Removes the expired values that are not being loaded.
+
+        Returns:
+            A list of the removed keys
+        """
+        now = time.time()
+        with self.lock:
+            expired = [key for key, entry in self.entries.items()
+                       if now - entry[0] >= entry[2]
+                       and key not in self.in_flight]
+            for key in expired:
+                del self.entries[key]
+        return expired
+
+
+    def invalidate(self, key):
+        """
+        Removes the value of a key so the next request loads it again.
+
+        Args:
+            key: key to remove
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+    def stats(self):
+        """
+        Returns the cache metrics.
+
+        Returns:
+            A dictionary of the number of entries, hits, misses, coalesced
+            requests and failed loads
+        """
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits,
+                    'misses': self.misses, 'coalesced': self.coalesced,
+                    'failures': self.failures}
+
+
+class TimelineCache(CoalescingCache):
+    """
+    Cache of user timelines. When a timeline expires, only tweets newer than
+    the highest cached tweet id are requested with since_id and merged into
+    the cached timeline, instead of fetching the whole timeline again. A
+    failed search, which returns no results dictionary, is only kept for
+    failed_ttl seconds.
+
+    Attribute(s):
+        search (function): makes a search call for a query and since_id
+        on_update (function): called with a user whenever a refresh finds
+                              new tweets by them
+        newest (dict): highest cached tweet id of each user
+        refreshes (int): incremental refresh calls made
+        new_tweets (int): tweets added by refreshes
+    """
+    def __init__(self, search, ttl, on_update=None, failed_ttl=0):
+        CoalescingCache.__init__(
+            self, None, ttl,
+            failed=lambda timeline: not isinstance(timeline, dict),
+            failed_ttl=failed_ttl)
+        self.search = search
+        self.on_update = on_update
+        self.newest = {}
+        self.refreshes = 0
+        self.new_tweets = 0
+
+
+    def __load__(self, user, entry):
+        """
+        Fetches the timeline of a user, or refreshes an expired timeline with
+        the tweets made since it was fetched.
+
+        Args:
+            user: twitter user to fetch the tweets of
+            entry: the expired (load time, timeline, seconds fresh) of the
+                   user, or None
+
+        Returns:
+            The timeline of the user
+        """
+        query = "from:%s" % user
+        since_id = self.newest.get(user)
+        if entry is None or since_id is None or self.failed(entry[1]):
+            timeline = self.search(query)
+            self.__track_newest__(user, timeline)
+            return timeline
+
+        self.refreshes += 1
+        update = self.search(query, since_id=since_id)
+        try:
+            statuses = update['statuses']
+        except TypeError:
+            # keep the cached timeline if the refresh failed
+            return entry[1]
+        if not statuses:
+            return entry[1]
+
+        # newest tweets first, keeping the size of a single search page
+        timeline = dict(entry[1])
+        timeline['statuses'] = \
+            (statuses + entry[1]['statuses'])[:TIMELINE_LENGTH]
+        self.new_tweets += len(statuses)
+        self.__track_newest__(user, timeline)
+        if self.on_update:
+            self.on_update(user)
+        return timeline
+
+
+    def __track_newest__(self, user, timeline):
+        """
+        Records the highest tweet id in a timeline.
+
+        Args:
+            user: twitter user the timeline belongs to
+            timeline: results of a search call
+        """
+        try:
+            ids = [tweet['id'] for tweet in timeline['statuses']]
+        except TypeError:
+            return
+        if ids:
+            self.newest[user] = max(ids + [self.newest.get(user, 0)])
+
+
+    def stats(self):
+        """
+        Returns the cache metrics.
+
+        Returns:
+            A dictionary of the number of entries, hits, misses, coalesced
+            requests, incremental refreshes and tweets added by them
+        """
+        stats = CoalescingCache.stats(self)
+        stats['refreshes'] = self.refreshes
+        stats['new_tweets'] = self.new_tweets
+        return stats
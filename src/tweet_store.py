@@ -0,0 +1,162 @@
+"""
+Author: Chris Lim
+Date: 2/28/18
+
+This module shrinks Twitter search results as soon as they are fetched. A
+search returns full tweet objects with users, entities, media and metadata,
+but the agents only read a few fields of each tweet, so responses are
+projected onto slim records. Tweet texts kept for path output can be stored
+compressed in blocks.
+"""
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+TWEET_TEXT = 'full_text'
+
+# number of texts compressed together in a block
+BLOCK_SIZE = 64
+
+# separates the texts of a block, never part of a tweet
+TEXT_SEPARATOR = '\0'
+
+
+def trim_tweet(tweet):
+    """
+    Projects a tweet onto the fields read by the agents: its id, text,
+    author and engagement counts, the screen names it mentions, and the
+    author of a retweet.
+
+    Args:
+        tweet: a tweet returned by a search call
+
+    Returns:
+        A slim tweet with the same layout as the original
+    """
+    slim = {
+        'id': tweet['id'],
+        TWEET_TEXT: tweet[TWEET_TEXT],
+        'retweet_count': tweet.get('retweet_count', 0),
+        'favorite_count': tweet.get('favorite_count', 0),
+        'entities': {
+            'user_mentions': [{'screen_name': mention['screen_name']}
+                              for mention in
+                              tweet['entities']['user_mentions']],
+        },
+    }
+
+    author = tweet.get('user')
+    if author:
+        slim['user'] = {'screen_name': author['screen_name']}
+
+    retweeted_status = tweet.get('retweeted_status')
+    if retweeted_status:
+        user = retweeted_status['user']
+        slim['retweeted_status'] = {
+            'user': {'screen_name': user['screen_name'],
+                     'verified': user.get('verified', False)},
+        }
+    return slim
+
+
+def trim_response(response):
+    """
+    Projects every tweet of a search response onto a slim tweet. Responses
+    without statuses, such as failed calls, are returned as they are.
+
+    Args:
+        response: the results of a search call
+
+    Returns:
+        A response holding only the slim statuses
+    """
+    try:
+        statuses = response['statuses']
+    except (TypeError, KeyError):
+        return response
+    return {'statuses': [trim_tweet(tweet) for tweet in statuses]}
+
+
+class TextStore(object):
+    """
+    Append-only store of tweet texts compressed in blocks of BLOCK_SIZE
+    texts, using zstd when the zstandard module is installed and zlib
+    otherwise. Texts are looked up by the index returned when they were added.
+
+    Attribute(s):
+        blocks (list): compressed blocks of texts
+        pending (list): texts not yet compressed into a block
+        cached (tuple): index and texts of the last decompressed block
+    """
+    def __init__(self):
+        self.blocks = []
+        self.pending = []
+        self.cached = (None, None)
+        if zstandard:
+            self.compress = zstandard.ZstdCompressor().compress
+            self.decompress = zstandard.ZstdDecompressor().decompress
+        else:
+            self.compress = zlib.compress
+            self.decompress = zlib.decompress
+
+
+    def __len__(self):
+        return len(self.blocks) * BLOCK_SIZE + len(self.pending)
+
+
+    def add(self, text):
+        """
+        Stores a tweet text.
+
+        Args:
+            text: the tweet text
+
+        Returns:
+            The index of the text
+        """
+        self.pending.append(text)
+        if len(self.pending) == BLOCK_SIZE:
+            block = TEXT_SEPARATOR.join(self.pending).encode('utf-8')
+            self.blocks.append(self.compress(block))
+            self.pending = []
+        return len(self) - 1
+
+
+    def extend(self, texts):
+        """
+        Stores several tweet texts.
+
+        Args:
+            texts: list of tweet texts
+
+        Returns:
+            The index of the first text
+        """
+        first = len(self)
+        for text in texts:
+            self.add(text)
+        return first
+
+
+    def get(self, index):
+        """
+        Looks up a stored tweet text.
+
+        Args:
+            index: the index of the text
+
+        Returns:
+            The tweet text
+        """
+        block, position = divmod(index, BLOCK_SIZE)
+        if block == len(self.blocks):
+            return self.pending[position]
+        if self.cached[0] != block:
+            texts = self.decompress(self.blocks[block]).decode('utf-8')
+            self.cached = (block, texts.split(TEXT_SEPARATOR))
+        return self.cached[1][position]
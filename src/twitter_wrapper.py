@@ -5,17 +5,119 @@ Date: 2/27/18
 This module acts as a wrapper for the Twython module. It allows the user to
 exceed the standard rate limit of the search call to the Twitter API by
 rotating accounts when a specified account exceeds it's limit. If all accounts
-timeout, it sleeps an application for 10 minutes before resuming.
+timeout, the query waits for the earliest account reset (or an exponential,
+jittered backoff when no reset time is known) before retrying, up to a
+maximum wait per query.
 """
 
-import datetime
+import random
+import time
 
 from time import sleep
 from twython import Twython, TwythonRateLimitError, TwythonError
+from tweet_store import trim_response
 
 # enter your keys, and tokens obtained from your twitter app
 ACCOUNTS = []
 
+# length of a Twitter rate limit window in seconds
+RATE_LIMIT_WINDOW = 15 * 60
+
+# first and largest backoff in seconds when no reset time is known
+BACKOFF_BASE = 30
+BACKOFF_CAP = RATE_LIMIT_WINDOW
+
+# extra random wait in seconds after a reset, so accounts are not hit at once
+RESET_JITTER = 5
+
+# longest total time in seconds a single query waits before it is dropped
+MAX_WAIT = 2 * RATE_LIMIT_WINDOW
+
+# consecutive rate limit errors before an account's circuit is opened
+BREAKER_THRESHOLD = 1
+
+
+class RetryPolicy(object):
+    """
+    Decides when accounts may be used and how long a query waits once every
+    account is rate limited. Each account has a circuit breaker that opens
+    after repeated rate limit errors and closes at the account's reset time.
+
+    Attribute(s):
+        base (float): first backoff in seconds
+        cap (float): largest backoff in seconds
+        max_wait (float): longest total wait in seconds for a single query
+        threshold (int): consecutive rate limit errors that open a circuit
+        failures (dict): consecutive rate limit errors of each account
+        open_until (dict): time each open circuit closes again
+    """
+    def __init__(self, base=BACKOFF_BASE, cap=BACKOFF_CAP, max_wait=MAX_WAIT,
+                 threshold=BREAKER_THRESHOLD):
+        self.base = base
+        self.cap = cap
+        self.max_wait = max_wait
+        self.threshold = threshold
+        self.failures = {}
+        self.open_until = {}
+
+
+    def is_open(self, account):
+        """
+        (bool) Returns whether an account's circuit is open, i.e. the account
+        should not be used until it resets.
+        """
+        return self.open_until.get(account, 0) > time.time()
+
+
+    def record_success(self, account):
+        """
+        Closes the circuit of an account after a successful call.
+
+        Args:
+            account: index of the account
+        """
+        self.failures.pop(account, None)
+        self.open_until.pop(account, None)
+
+
+    def record_rate_limit(self, account, reset=None):
+        """
+        Counts a rate limit error and opens the account's circuit once the
+        threshold is reached. The circuit stays open until the reset time
+        reported by Twitter, or for a full window if none was reported.
+
+        Args:
+            account: index of the account
+            reset: epoch time the account's limit resets, if known
+        """
+        self.failures[account] = self.failures.get(account, 0) + 1
+        if self.failures[account] < self.threshold:
+            return
+        try:
+            reset = float(reset)
+        except (TypeError, ValueError):
+            reset = time.time() + RATE_LIMIT_WINDOW
+        self.open_until[account] = reset
+
+
+    def backoff(self, attempt):
+        """
+        Returns how long to wait before retrying once every account is rate
+        limited. If any reset time is known the wait lasts until the earliest
+        reset, otherwise it is an exponential backoff with full jitter.
+
+        Args:
+            attempt: number of waits this query has already made
+
+        Returns:
+            The wait in seconds
+        """
+        now = time.time()
+        resets = [reset for reset in self.open_until.values() if reset > now]
+        if resets:
+            return min(resets) - now + random.uniform(0, RESET_JITTER)
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
 
 class TwitterConnection(object):
     """
@@ -27,12 +129,22 @@ class TwitterConnection(object):
         count (int): The current account being used
         connection (obj): Twython object that exists as the current connection
         connected (bool): Represents whether a connection is present
+        policy (RetryPolicy): Decides waits and which accounts may be used
+        stalled (float): Total seconds spent waiting for rate limits
+        stalls (int): Number of waits made for rate limits
+        dropped (int): Number of queries given up after the maximum wait
+        trim (bool): Represents whether results are trimmed to slim tweets
     """
 
-    def __init__(self, trace=False):
+    def __init__(self, trace=False, policy=None, trim=True):
         self.count = 0
+        self.trim = trim
         self.connection = None
         self.connected = False
+        self.policy = policy or RetryPolicy()
+        self.stalled = 0.0
+        self.stalls = 0
+        self.dropped = 0
 
 
     @property
@@ -49,11 +161,24 @@ class TwitterConnection(object):
         return self.count
 
 
+    @property
+    def get_stalled(self):
+        """(float) Returns the total seconds spent waiting for rate limits"""
+        return self.stalled
+
+
     def connect_to_twitter(self):
         """
-        Rotates which account is used to connect to the Twitter API. Then
-        establishes a connection to Twitter using twython.
+        Rotates which account is used to connect to the Twitter API, skipping
+        accounts whose circuit is open. Then establishes a connection to
+        Twitter using twython.
         """
+        for _ in range(len(ACCOUNTS)):
+            if self.count >= len(ACCOUNTS):
+                self.count = 0
+            if not self.policy.is_open(self.count):
+                break
+            self.count += 1
         if self.count >= len(ACCOUNTS):
             self.count = 0
         key, secret, token, token_secret = ACCOUNTS[self.count]
@@ -62,32 +187,58 @@ class TwitterConnection(object):
         self.count += 1
 
 
-    def search_twitter(self, query):
+    def search_twitter(self, query, since_id=None, max_id=None):
         """
         Makes a search call to Twitter based on a give query. If the rate limit
-        is exceeded by the call, a new connection is established and the search
-        call is re-made. If all accounts fail the app sleeps for 10 minutes,
-        then the process is restarted.
+        is exceeded by the call, the account's circuit is opened, a new
+        connection is established and the search call is re-made. If all
+        accounts are rate limited the query waits as decided by the retry
+        policy, and is given up once its maximum wait would be exceeded.
 
         Args:
             query: the query made to Twitter
+            since_id: only return tweets newer than this tweet id
+            max_id: only return tweets up to this tweet id
 
         Returns:
-            The results of the search call made to Twitter
+            The results of the search call made to Twitter, trimmed to slim
+            tweets unless trimming is turned off, or an empty list if the call
+            failed or waited too long
 
         """
-        for _ in range(len(ACCOUNTS)):
-            try:
-                return self.connection.search(q=query, count=100, tweet_mode='extended')
-            except TwythonRateLimitError:
-                self.connect_to_twitter()
-                self.connected = False
-                continue
-            except TwythonError:
+        params = {'q': query, 'count': 100, 'tweet_mode': 'extended'}
+        if since_id:
+            params['since_id'] = since_id
+        if max_id:
+            params['max_id'] = max_id
+
+        waited = 0.0
+        attempt = 0
+        while True:
+            for _ in range(len(ACCOUNTS)):
+                account = self.count - 1
+                if self.policy.is_open(account):
+                    self.connect_to_twitter()
+                    continue
+                try:
+                    results = self.connection.search(**params)
+                except TwythonRateLimitError as error:
+                    self.policy.record_rate_limit(account, error.retry_after)
+                    self.connect_to_twitter()
+                    continue
+                except TwythonError:
+                    return []
+                self.policy.record_success(account)
+                return trim_response(results) if self.trim else results
+
+            # every account is rate limited
+            wait = self.policy.backoff(attempt)
+            if waited + wait > self.policy.max_wait:
+                self.dropped += 1
                 return []
-            self.connected = True
-            break
-        if not self.connected:            
-            sleep(10*60)
+            sleep(wait)
+            waited += wait
+            self.stalled += wait
+            self.stalls += 1
+            attempt += 1
             self.connect_to_twitter()
-            self.search_twitter(query)